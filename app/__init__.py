@@ -6,12 +6,26 @@ from starlette.middleware.cors import CORSMiddleware
 from fastapi import FastAPI
 from app.config import settings
 from app.api_v1 import api_router
+from app.auth import hashing_executor
+from app.auth.login import auth_load_revocations
+from app.auth.middleware import AuthenticationMiddleware
+from app.log import configure_logging, shutdown_logging
+from app.models import refresh_token_queue
+from app.tasks import refresh_token_sweeper
+from app.tracing import TracingMiddleware
 
+logger = logging.getLogger(__name__)
 
 def get_application() -> FastAPI:
-    print(f"Starting app {settings.TITLE} version {settings.VERSION} config {settings.__class__}")
-
-    application = FastAPI(**settings.fastapi_kwargs)
+    configure_logging()
+    logger.info('starting app %s version %s config %s', settings.TITLE, settings.VERSION, settings.__class__.__name__)
+
+    application = FastAPI(**settings.fastapi_kwargs,
+                          on_startup=[auth_load_revocations, refresh_token_queue.start, refresh_token_sweeper.start],
+                          on_shutdown=[refresh_token_sweeper.stop, refresh_token_queue.stop,
+                                       hashing_executor.shutdown, shutdown_logging])
+    if settings.AUTH_MIDDLEWARE_ENABLED:
+        application.add_middleware(AuthenticationMiddleware, router=application.router)
     application.add_middleware(
         CORSMiddleware,
         allow_origins=settings.ALLOWED_HOSTS,
@@ -20,6 +34,9 @@ def get_application() -> FastAPI:
         allow_headers=["*"],
     )
 
+    if settings.TRACING_ENABLED:
+        application.add_middleware(TracingMiddleware)
+
     application.include_router(api_router)
 
     return application
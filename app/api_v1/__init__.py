@@ -1,5 +1,11 @@
-from fastapi import APIRouter
+import hashlib
+import json
+
+from fastapi import APIRouter, HTTPException, Request, Response
 from app.api_v1 import auth
+from app.auth.tokens import jwks
+from app.config import settings
+from app.metrics import registry
 
 api_router = APIRouter()
 api_router.include_router(auth.router, prefix="/auth", tags=["auth"])
@@ -8,3 +14,23 @@ api_router.include_router(auth.router, prefix="/auth", tags=["auth"])
 @api_router.get("/", include_in_schema=False)
 async def health():
     return {"status": "ok"}
+
+
+@api_router.get("/.well-known/jwks.json", include_in_schema=False)
+async def jwks_document(request: Request):
+    body = json.dumps(jwks(), separators=(',', ':'), sort_keys=True).encode()
+    etag = '"%s"' % hashlib.sha256(body).hexdigest()
+    headers = {'Cache-Control': 'public, max-age=%d' % settings.JWKS_MAX_AGE, 'ETag': etag}
+
+    if request.headers.get('if-none-match') == etag:
+        return Response(status_code=304, headers=headers)
+
+    return Response(body, media_type='application/json', headers=headers)
+
+
+@api_router.get("/metrics", include_in_schema=False)
+async def metrics():
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=404)
+
+    return Response(registry.exposition(), media_type='text/plain; version=0.0.4; charset=utf-8')
@@ -1,16 +1,19 @@
-from typing import Optional
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, Request
+from fastapi import APIRouter, Depends, Request, HTTPException
 from pydantic import BaseModel
 from sqlmodel.ext.asyncio.session import AsyncSession
 from starlette.responses import JSONResponse
 
-from app.auth.login import authenticate, auth_token_response, auth_generate_tokens, auth_access_token_required, \
-    auth_clear_tokens, auth_refresh_token_required, auth_blacklist_refresh_token
+from app.auth.login import authenticate, auth_token_response, auth_generate_tokens, auth_access_principal, \
+    auth_clear_tokens, auth_refresh_token_required, auth_rate_limit, auth_rotate_refresh_token, auth_verify_tokens
+from app.auth.principal import Principal
+from app.config import settings
 from app.database import get_async_session
+from app.metrics import MetricsRoute
 from app.models.user import User
 
-router = APIRouter()
+router = APIRouter(route_class=MetricsRoute)
 
 
 class UserLogin(BaseModel):
@@ -18,6 +21,10 @@ class UserLogin(BaseModel):
     password: str
 
 
+class TokenBatch(BaseModel):
+    tokens: List[str]
+
+
 class LoginToken(BaseModel):
     access_token: Optional[str]
     refresh_token: Optional[str]
@@ -29,6 +36,7 @@ class LoginToken(BaseModel):
 @router.post("/login/cookie")
 async def login_cookie(request: Request, credentials: UserLogin,
                        db: AsyncSession = Depends(get_async_session)) -> JSONResponse:
+    await auth_rate_limit(request, credentials.login)
     user: User = await authenticate(credentials.login, credentials.password, db)
     tokens = await auth_generate_tokens(request, user, db)
 
@@ -39,6 +47,7 @@ async def login_cookie(request: Request, credentials: UserLogin,
 @router.post("/login/token")
 async def login_token(request: Request, credentials: UserLogin,
                       db: AsyncSession = Depends(get_async_session)) -> JSONResponse:
+    await auth_rate_limit(request, credentials.login)
     user: User = await authenticate(credentials.login, credentials.password, db)
     tokens = await auth_generate_tokens(request, user, db)
 
@@ -46,22 +55,29 @@ async def login_token(request: Request, credentials: UserLogin,
 
 
 @router.get("/verify")
-async def verify(user: User = Depends(auth_access_token_required)):
+async def verify(user: Principal = Depends(auth_access_principal)):
     return {'uid': user.id}
 
 
+@router.post("/verify/batch")
+async def verify_batch(batch: TokenBatch, db: AsyncSession = Depends(get_async_session)):
+    if len(batch.tokens) > settings.VERIFY_BATCH_MAX_TOKENS:
+        raise HTTPException(status_code=413, detail="Too many tokens")
+
+    return {'results': await auth_verify_tokens(batch.tokens, db)}
+
+
 @router.post('/logout')
-async def logout(user: User = Depends(auth_refresh_token_required),
+async def logout(user: Principal = Depends(auth_refresh_token_required),
                  db: AsyncSession = Depends(get_async_session)) -> JSONResponse:
     return await auth_clear_tokens(user, db)
 
 
 @router.post('/refresh')
 async def token_refresh(request: Request,
-                        user: User = Depends(auth_refresh_token_required),
+                        user: Principal = Depends(auth_refresh_token_required),
                         db: AsyncSession = Depends(get_async_session)) -> JSONResponse:
-    tokens = await auth_generate_tokens(request, user, db, refresh_token=False)
-    await auth_blacklist_refresh_token(user.token, db)
+    tokens = await auth_rotate_refresh_token(request, user, db, refresh_token=False)
 
     cookie_present = request.cookies.get('refresh_token', None) is not None
     return auth_token_response(tokens, return_token=not cookie_present, return_cookie=cookie_present)
@@ -69,10 +85,9 @@ async def token_refresh(request: Request,
 
 @router.post('/refresh/pair')
 async def dual_token_refresh(request: Request,
-                             user: User = Depends(auth_refresh_token_required),
+                             user: Principal = Depends(auth_refresh_token_required),
                              db: AsyncSession = Depends(get_async_session)) -> JSONResponse:
-    tokens = await auth_generate_tokens(request, user, db)
-    await auth_blacklist_refresh_token(user.token, db)
+    tokens = await auth_rotate_refresh_token(request, user, db)
 
     cookie_present = request.cookies.get('refresh_token', None) is not None
     return auth_token_response(tokens, return_token=not cookie_present, return_cookie=cookie_present)
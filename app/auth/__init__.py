@@ -1,5 +1,13 @@
+import asyncio
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+
 from passlib.context import CryptContext
 
+from app.config import settings
+from app.metrics import registry
+
 PASSWORD_CONTEXT = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 
@@ -9,3 +17,81 @@ def get_hashed_password(password: str) -> str:
 
 def verify_password(password: str, hashed_password: str) -> bool:
     return PASSWORD_CONTEXT.verify(password, hashed_password)
+
+
+def verify_password_timed(password: str, hashed_password: str) -> tuple:
+    # timed inside the worker, so the histogram sees bcrypt alone and not the executor queue
+    started = time.perf_counter()
+    return verify_password(password, hashed_password), time.perf_counter() - started
+
+
+def normalize_login(login: str) -> str:
+    return login.strip().lower()
+
+
+class HashingExecutor:
+    """
+    Bounded worker pool for password hashing, keeps bcrypt rounds off the event loop.
+    Counters are only touched from the event loop thread, so they need no locking.
+    """
+
+    def __init__(self, workers: int, kind: str = 'thread'):
+        self.workers = max(1, workers)
+        self.kind = kind
+        self.pending = 0
+        self.completed = 0
+        self.max_pending = 0
+        self._executor: Optional[Executor] = None
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == 'process':
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='hashing')
+        return self._executor
+
+    async def run(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        self.pending += 1
+        self.max_pending = max(self.max_pending, self.pending)
+        try:
+            return await loop.run_in_executor(self.executor, fn, *args)
+        finally:
+            self.pending -= 1
+            self.completed += 1
+
+    def stats(self) -> dict:
+        return {
+            'workers': self.workers,
+            'in_flight': min(self.pending, self.workers),
+            'queued': max(0, self.pending - self.workers),
+            'max_pending': self.max_pending,
+            'completed': self.completed,
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+hashing_executor = HashingExecutor(settings.PASSWORD_HASH_WORKERS, kind=settings.PASSWORD_HASH_EXECUTOR)
+
+password_verify_duration = registry.histogram('auth_password_verify_seconds', 'bcrypt verification time',
+                                              buckets=(.05, .1, .15, .2, .25, .3, .4, .5, .75, 1, 2))
+password_hash_pending = registry.gauge('auth_password_hash_pending', 'Password hashes queued or running',
+                                       ['state'])
+password_hash_pending.labels('in_flight').set_function(lambda: hashing_executor.stats()['in_flight'])
+password_hash_pending.labels('queued').set_function(lambda: hashing_executor.stats()['queued'])
+
+
+async def get_hashed_password_async(password: str) -> str:
+    return await hashing_executor.run(get_hashed_password, password)
+
+
+async def verify_password_async(password: str, hashed_password: str) -> bool:
+    verified, elapsed = await hashing_executor.run(verify_password_timed, password, hashed_password)
+    password_verify_duration.observe(elapsed)
+    return verified
@@ -0,0 +1,72 @@
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+from app.metrics import registry
+
+cache_hits = registry.counter('auth_cache_hits_total', 'Cache lookups that found a live entry', ['cache'])
+cache_misses = registry.counter('auth_cache_misses_total', 'Cache lookups that missed or found an expired entry',
+                                ['cache'])
+cache_hit_ratio = registry.gauge('auth_cache_hit_ratio', 'Hits over all lookups since start', ['cache'])
+cache_size = registry.gauge('auth_cache_size', 'Entries currently cached', ['cache'])
+
+
+class TTLCache:
+    """
+    Bounded LRU cache with per-entry expiry. Not thread safe, meant to be used from the event loop.
+    Named caches export their hit and miss counters as metrics.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, name: Optional[str] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+
+        if name is not None:
+            cache_hits.labels(name).set_function(lambda: self.hits)
+            cache_misses.labels(name).set_function(lambda: self.misses)
+            cache_hit_ratio.labels(name).set_function(lambda: self.hits / ((self.hits + self.misses) or 1))
+            cache_size.labels(name).set_function(lambda: len(self._data))
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        item = self._data.get(key)
+        if item is not None:
+            value, expires = item
+            if expires > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return value
+
+            del self._data[key]
+
+        self.misses += 1
+        return default
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else ttl
+        if self.maxsize <= 0 or ttl <= 0:
+            return
+
+        self._data[key] = (value, time.monotonic() + ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self) -> dict:
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
@@ -0,0 +1,77 @@
+import asyncio
+import time
+from typing import Dict, Optional
+
+import httpx
+import jwt
+
+from app.auth.tokens import REQUIRED_CLAIMS, UnknownKeyError
+
+
+class JWKSClient:
+    """
+    Verifies tokens locally against the public keys published at /.well-known/jwks.json.
+    Keys are cached by kid, the document is refetched after max_age (conditionally, using the ETag)
+    or when a token carries an unknown kid, but never more often than min_refresh_interval.
+    """
+
+    def __init__(self, url: str, max_age: float = 3600, min_refresh_interval: float = 30,
+                 client: Optional[httpx.AsyncClient] = None):
+        self.url = url
+        self.max_age = max_age
+        self.min_refresh_interval = min_refresh_interval
+        self._client = client
+        self._keys: Dict[str, tuple] = {}
+        self._etag = None
+        self._fetched_at = None
+        self._lock = asyncio.Lock()
+
+    def _stale(self, now) -> bool:
+        return self._fetched_at is None or now - self._fetched_at >= self.max_age
+
+    async def refresh(self, force: bool = False):
+        async with self._lock:
+            now = time.monotonic()
+            if self._fetched_at is not None:
+                if now - self._fetched_at < self.min_refresh_interval:
+                    return
+                if not force and not self._stale(now):
+                    return
+
+            headers = {'If-None-Match': self._etag} if self._etag else {}
+            if self._client is not None:
+                response = await self._client.get(self.url, headers=headers)
+            else:
+                async with httpx.AsyncClient() as client:
+                    response = await client.get(self.url, headers=headers)
+
+            self._fetched_at = now
+            if response.status_code == 304:
+                return
+
+            response.raise_for_status()
+            keys = {}
+            for jwk in response.json().get('keys', []):
+                if 'kid' not in jwk or 'alg' not in jwk:
+                    continue
+                keys[jwk['kid']] = (jwk['alg'], jwt.PyJWK.from_dict(jwk, algorithm=jwk['alg']).key)
+
+            self._keys = keys
+            self._etag = response.headers.get('etag')
+
+    async def get_key(self, kid: str) -> tuple:
+        if self._stale(time.monotonic()):
+            await self.refresh()
+        if kid not in self._keys:
+            await self.refresh(force=True)
+        if kid not in self._keys:
+            raise UnknownKeyError('unknown key id')
+        return self._keys[kid]
+
+    async def decode(self, token, issuer) -> dict:
+        kid = jwt.get_unverified_header(token).get('kid')
+        if kid is None:
+            raise UnknownKeyError('missing key id')
+
+        algorithm, key = await self.get_key(kid)
+        return jwt.decode(token, key, algorithms=[algorithm], issuer=issuer, options={'require': REQUIRED_CLAIMS})
@@ -1,52 +1,92 @@
 import datetime
-from typing import Union
+from typing import List, Optional, Union
 
 import jwt.exceptions
 from fastapi import Request, HTTPException, Depends
 from fastapi.security import HTTPBearer, APIKeyCookie
-from sqlmodel import or_
-from sqlmodel import select
+from sqlmodel import select, update
 from sqlmodel.ext.asyncio.session import AsyncSession
 from starlette.responses import JSONResponse
 
+from app.auth import normalize_login
+from app.auth.admission import ConcurrencyLimiter
+from app.auth.principal import Principal, principal_cache
+from app.auth.ratelimit import LoginRateLimiter, load_backend
+from app.auth.revocation import revocation_list
 from app.auth.tokens import AccessToken, RefreshToken
-from app.database import get_async_session
-from app.models import UserRefreshToken
-from app.models.user import User
-
-
+from app.config import settings
+from app.database import get_async_session, async_session_maker
+from app.metrics import registry
+from app.models import UserRefreshToken, refresh_token_queue
+from app.models.user import User, UserLoginKey
+from app.tracing import span, traced
+
+
+login_limiter = ConcurrencyLimiter(settings.LOGIN_MAX_CONCURRENCY, settings.LOGIN_MAX_QUEUE, settings.LOGIN_MAX_WAIT)
+login_rate_limiter = LoginRateLimiter(
+    load_backend(settings.LOGIN_RATE_LIMIT_BACKEND, max_keys=settings.LOGIN_RATE_LIMIT_MAX_KEYS),
+    ip_per_minute=settings.LOGIN_RATE_LIMIT_IP_PER_MINUTE,
+    ip_burst=settings.LOGIN_RATE_LIMIT_IP_BURST,
+    login_per_minute=settings.LOGIN_RATE_LIMIT_LOGIN_PER_MINUTE,
+    login_burst=settings.LOGIN_RATE_LIMIT_LOGIN_BURST,
+)
+
+login_pending = registry.gauge('auth_login_pending', 'Logins running or waiting for a slot', ['state'])
+login_pending.labels('in_flight').set_function(lambda: login_limiter.stats()['in_flight'])
+login_pending.labels('queued').set_function(lambda: login_limiter.stats()['queued'])
+login_rejected = registry.counter('auth_login_rejected_total', 'Logins turned away before the password check',
+                                  ['reason'])
+login_rejected.labels('overloaded').set_function(lambda: login_limiter.stats()['rejected'])
+login_rejected.labels('rate_limited').set_function(lambda: login_rate_limiter.rejected)
+
+
+async def auth_rate_limit(request: Request, login: str):
+    if settings.LOGIN_RATE_LIMIT_ENABLED:
+        await login_rate_limiter.check(request.client.host, login)
+
+
+@traced()
 async def authenticate(login: str, password: str, db: AsyncSession):
-    query = select(User).where(or_(User.username == login, User.email == login))
-    user = (await db.execute(query)).scalars().first()
-    if not user:
-        raise HTTPException(status_code=403, detail="Invalid credentials")
+    async with login_limiter:
+        query = select(User).join(UserLoginKey, UserLoginKey.user == User.id) \
+            .where(UserLoginKey.key == normalize_login(login))
+        with span('user_lookup'):
+            user = (await db.execute(query)).scalars().first()
+        if not user:
+            raise HTTPException(status_code=403, detail="Invalid credentials")
 
-    if not user.check_password(password):
-        raise HTTPException(status_code=403, detail="Invalid credentials")
+        with span('password_verify'):
+            verified = await user.check_password_async(password)
+        if not verified:
+            raise HTTPException(status_code=403, detail="Invalid credentials")
 
-    return user
+        return user
 
 
-async def auth_generate_tokens(request: Request, user: User, db: AsyncSession, access_token=True, refresh_token=True):
+@traced()
+async def auth_generate_tokens(request: Request, user: Union[User, Principal], db: AsyncSession, access_token=True,
+                               refresh_token=True, commit=True):
     data = {}
-    if access_token:
-        access_token = AccessToken.encode({'uid': user.id})
+    with span('token_encode'):
+        if access_token:
+            access_token = AccessToken.encode({'uid': user.id})
 
-    if refresh_token:
-        refresh_token = RefreshToken.encode({'uid': user.id})
+        if refresh_token:
+            refresh_token = RefreshToken.mint({'uid': user.id})
 
+    if refresh_token:
         ip_address = request.client.host
         user_agent = request.headers.get('user-agent', None)
 
         # create refresh token db record
-        await UserRefreshToken.from_token(db, user, refresh_token, ip_address, user_agent)
+        await UserRefreshToken.from_token(db, user, refresh_token, ip_address, user_agent, commit=commit)
 
     if access_token:
         data['access_token'] = access_token
         data['access_expire'] = datetime.datetime.utcnow() + AccessToken.expire_time
 
     if refresh_token:
-        data['refresh_token'] = refresh_token
+        data['refresh_token'] = refresh_token.token
         data['refresh_expire'] = datetime.datetime.utcnow() + RefreshToken.expire_time
 
     data['uid'] = user.id
@@ -89,42 +129,115 @@ def auth_token_response(tokens: dict, return_token=False, return_cookie=False):
     return response
 
 
+PRINCIPAL_COLUMNS = (User.id, User.is_active, User.is_superuser)
+
+
+async def auth_load_principal(uid: int, db: AsyncSession, cached=False) -> Optional[tuple]:
+    # plain column row, no ORM instance or identity map entry and no validation on the auth path
+    row = principal_cache.get(uid) if cached else None
+    if row is not None:
+        return row
+
+    query = select(*PRINCIPAL_COLUMNS).where(User.id == uid)
+    row = (await db.execute(query)).first()
+    if row is not None:
+        row = tuple(row)
+        if cached:
+            principal_cache.set(uid, row)
+
+    return row
+
+
+async def auth_verify_tokens(tokens: List[str], db: AsyncSession) -> List[dict]:
+    """Verifies access tokens in bulk, users missing from the principal cache are loaded with a single query."""
+    payloads = []
+    for token in tokens:
+        try:
+            payloads.append(AccessToken.decode(token))
+        except jwt.exceptions.InvalidTokenError:
+            payloads.append(None)
+
+    users = {}
+    missing = []
+    for uid in {payload['uid'] for payload in payloads if payload}:
+        row = principal_cache.get(uid)
+        if row is not None:
+            users[uid] = row
+        else:
+            missing.append(uid)
+
+    if missing:
+        query = select(*PRINCIPAL_COLUMNS).where(User.id.in_(missing))
+        for row in (await db.execute(query)).all():
+            users[row[0]] = tuple(row)
+            principal_cache.set(row[0], users[row[0]])
+
+    results = []
+    for payload in payloads:
+        if payload is None:
+            results.append({'valid': False, 'detail': "Invalid token"})
+        elif payload['uid'] not in users:
+            results.append({'valid': False, 'detail': "Wrong user credentials"})
+        elif not users[payload['uid']][1]:
+            results.append({'valid': False, 'detail': "User is not active"})
+        else:
+            results.append({'valid': True, 'uid': payload['uid']})
+
+    return results
+
+
+async def auth_refresh_token_revoked(payload: dict, db: AsyncSession) -> bool:
+    revoked = revocation_list.is_revoked(payload['jti']) if settings.REVOCATION_CACHE_ENABLED else None
+    if revoked is None and settings.REFRESH_TOKEN_WRITE_BEHIND:
+        revoked = refresh_token_queue.is_revoked(payload['jti'])
+
+    if revoked is None:
+        query = select(UserRefreshToken.id).where(UserRefreshToken.jti == payload['jti'],
+                                                  UserRefreshToken.blacklisted.is_(True))
+        revoked = (await db.execute(query)).first() is not None
+
+    return revoked
+
+
+@traced()
 async def auth_verify_token(token, db: AsyncSession, token_class: Union[AccessToken, RefreshToken] = AccessToken):
     try:
         payload = token_class.decode(token)
     except:
         raise HTTPException(status_code=403, detail="Invalid token")
 
-    query = select(User).where(User.id == payload['uid'])
-    user = (await db.execute(query)).scalars().first()
-    if not user:
+    row = await auth_load_principal(payload['uid'], db, cached=token_class is AccessToken)
+    if not row:
         raise HTTPException(status_code=403, detail="Wrong user credentials")
 
+    user = Principal(*row, token, payload)
     if not user.is_active:
-        HTTPException(status_code=403, detail="User is not active")
+        raise HTTPException(status_code=403, detail="User is not active")
 
-    if token_class == RefreshToken:
-        query = select(UserRefreshToken).where(UserRefreshToken.jti == payload.get('jti'),
-                                               UserRefreshToken.blacklisted is True)
-        if (await db.execute(query)).scalars().first():
-            raise HTTPException(status_code=403, detail="Invalid token")
+    if token_class == RefreshToken and await auth_refresh_token_revoked(payload, db):
+        raise HTTPException(status_code=403, detail="Invalid token")
 
     return user
 
 
+bearer_scheme = HTTPBearer(auto_error=False)
+cookie_schemes = {
+    AccessToken: APIKeyCookie(auto_error=False, name='access_token'),
+    RefreshToken: APIKeyCookie(auto_error=False, name='refresh_token'),
+}
+
+
 async def auth_check_token(request: Request, db: AsyncSession,
                            token_class: Union[AccessToken, RefreshToken] = AccessToken):
-    access_token = await HTTPBearer(auto_error=False)(request)
+    access_token = await bearer_scheme(request)
     if access_token:
         token_user = await auth_verify_token(access_token.credentials, db, token_class=token_class)
         if token_user is not None:
-            token_user.set_token(access_token.credentials)
             return token_user
     else:
         token_user = None
 
-    cookie_name = 'access_token' if token_class is AccessToken else 'refresh_token'
-    access_cookie = await APIKeyCookie(auto_error=False, name=cookie_name)(request)
+    access_cookie = await cookie_schemes[token_class](request)
     if access_cookie:
         cookie_user = await auth_verify_token(access_cookie, db, token_class=token_class)
     else:
@@ -133,7 +246,6 @@ async def auth_check_token(request: Request, db: AsyncSession,
     if token_user is None and cookie_user is None:
         raise HTTPException(status_code=403, detail="Invalid token")
 
-    cookie_user.set_token(access_cookie)
     return cookie_user
 
 
@@ -145,27 +257,105 @@ async def auth_refresh_token_required(request: Request, db: AsyncSession = Depen
     return await auth_check_token(request, db, token_class=RefreshToken)
 
 
-async def auth_blacklist_refresh_token(token: str, db: AsyncSession):
-    try:
-        payload = RefreshToken.decode(token)
-    except jwt.exceptions.InvalidTokenError:
-        payload = None
+async def auth_state_principal(request: Request, db: AsyncSession,
+                               token_class: Union[AccessToken, RefreshToken]) -> Principal:
+    # set by AuthenticationMiddleware for routes depending on auth_access_principal/auth_refresh_principal,
+    # without the middleware the token is checked here with the request's session
+    state = request.scope.get('state', {})
+    if 'auth_error' in state:
+        raise state['auth_error']
 
-    if payload:
-        query = select(UserRefreshToken).where(UserRefreshToken.jti == payload['jti'])
-        token: UserRefreshToken = (await db.execute(query)).scalars().first()
-        if token:
-            token.blacklisted = True
-            token.blacklisted_at = datetime.datetime.utcnow()
-            db.add(token)
-            await db.commit()
+    principal = state.get('principal')
+    if principal is not None and principal.token_claims['iss'] == token_class.issuer:
+        return principal
 
+    return await auth_check_token(request, db, token_class=token_class)
 
-async def auth_clear_tokens(user: User, db: AsyncSession):
+
+async def auth_access_principal(request: Request, db: AsyncSession = Depends(get_async_session)):
+    return await auth_state_principal(request, db, AccessToken)
+
+
+async def auth_refresh_principal(request: Request, db: AsyncSession = Depends(get_async_session)):
+    return await auth_state_principal(request, db, RefreshToken)
+
+
+async def auth_revoke_refresh_token(claims: dict, db: AsyncSession) -> Optional[bool]:
+    """
+    Blacklists the refresh token row within the current transaction, without committing.
+    Returns True when it was revoked now, False when it was revoked before and None when it was never stored.
+    """
+    query = update(UserRefreshToken) \
+        .where(UserRefreshToken.jti == claims['jti'], UserRefreshToken.blacklisted.is_(False)) \
+        .values(blacklisted=True, blacklisted_at=datetime.datetime.utcnow()) \
+        .execution_options(synchronize_session=False)
+    if (await db.execute(query)).rowcount:
+        return True
+
+    if settings.REFRESH_TOKEN_WRITE_BEHIND:
+        queued = refresh_token_queue.revoke(claims['jti'])
+        if queued is not None:
+            return queued
+
+    query = select(UserRefreshToken.id).where(UserRefreshToken.jti == claims['jti'])
+    return False if (await db.execute(query)).first() else None
+
+
+def auth_record_revocation(claims: dict, revoked: Optional[bool]):
+    # with write-behind, a token not found here may still sit in another worker's queue,
+    # the revocation list tells that worker to store it blacklisted
+    if revoked or (revoked is None and settings.REFRESH_TOKEN_WRITE_BEHIND):
+        revocation_list.add(claims['jti'], claims['exp'])
+
+
+async def auth_blacklist_refresh_token(token: str, db: AsyncSession, claims: dict = None):
+    if claims is None:
+        try:
+            claims = RefreshToken.decode(token)
+        except jwt.exceptions.InvalidTokenError:
+            return
+
+    revoked = await auth_revoke_refresh_token(claims, db)
+    if revoked:
+        await db.commit()
+
+    auth_record_revocation(claims, revoked)
+
+
+async def auth_rotate_refresh_token(request: Request, user: Principal, db: AsyncSession, refresh_token=True):
+    # revoking the presented token and storing its successor is one transaction, the conditional update
+    # lets only one of several concurrent rotations of the same token through
+    claims = user.token_claims
+    revoked = await auth_revoke_refresh_token(claims, db)
+    if revoked is False:
+        await db.rollback()
+        raise HTTPException(status_code=403, detail="Invalid token")
+
+    tokens = await auth_generate_tokens(request, user, db, refresh_token=refresh_token, commit=False)
+    await db.commit()
+
+    auth_record_revocation(claims, revoked)
+
+    return tokens
+
+
+async def auth_clear_tokens(user: Principal, db: AsyncSession):
     response = JSONResponse(content={})
     response.delete_cookie('refresh_token')
     response.delete_cookie('access_token')
 
-    await auth_blacklist_refresh_token(user.token, db)
+    await auth_blacklist_refresh_token(user.token, db, claims=user.token_claims)
 
     return response
+
+
+async def auth_load_revocations():
+    if not settings.REVOCATION_CACHE_ENABLED:
+        return
+
+    query = select(UserRefreshToken.jti, UserRefreshToken.expires_at) \
+        .where(UserRefreshToken.blacklisted.is_(True), UserRefreshToken.expires_at > datetime.datetime.now())
+    async with async_session_maker() as db:
+        rows = (await db.execute(query)).all()
+
+    revocation_list.load((jti, expires_at.timestamp()) for jti, expires_at in rows)
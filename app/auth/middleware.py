@@ -0,0 +1,87 @@
+from typing import Optional
+
+from fastapi import HTTPException
+from starlette.requests import cookie_parser
+from starlette.routing import Match, Router
+
+from app.auth.login import auth_access_principal, auth_refresh_principal, auth_verify_token
+from app.auth.tokens import AccessToken, RefreshToken
+from app.database import async_session_maker
+
+PRINCIPAL_DEPENDENCIES = {
+    auth_access_principal: AccessToken,
+    auth_refresh_principal: RefreshToken,
+}
+
+
+def scope_token(scope, cookie_name: str) -> Optional[str]:
+    authorization = cookie = None
+    for name, value in scope['headers']:
+        if name == b'authorization':
+            authorization = value
+        elif name == b'cookie':
+            cookie = value
+
+    if authorization:
+        scheme, _, credentials = authorization.decode('latin-1').partition(' ')
+        if scheme.lower() == 'bearer' and credentials:
+            return credentials
+
+    if cookie:
+        return cookie_parser(cookie.decode('latin-1')).get(cookie_name)
+
+    return None
+
+
+class AuthenticationMiddleware:
+    """
+    Verifies the bearer token (or the token cookie when there is no bearer) once, straight from the raw scope,
+    and stores the principal in scope['state'] before the request is routed. Routes opt in by depending on
+    auth_access_principal or auth_refresh_principal, every other route is passed through untouched.
+    """
+
+    def __init__(self, app, router: Router):
+        self.app = app
+        self.router = router
+        self._routes = None
+
+    @property
+    def routes(self) -> list:
+        if self._routes is None:
+            self._routes = []
+            for route in self.router.routes:
+                dependant = getattr(route, 'dependant', None)
+                for dependency in dependant.dependencies if dependant else []:
+                    if dependency.call in PRINCIPAL_DEPENDENCIES:
+                        self._routes.append((route, PRINCIPAL_DEPENDENCIES[dependency.call]))
+                        break
+
+        return self._routes
+
+    def match(self, scope):
+        for route, token_class in self.routes:
+            if route.matches(scope)[0] == Match.FULL:
+                return token_class
+        return None
+
+    async def authenticate(self, scope, token_class):
+        state = scope.setdefault('state', {})
+        cookie_name = 'access_token' if token_class is AccessToken else 'refresh_token'
+        token = scope_token(scope, cookie_name)
+        if token is None:
+            state['auth_error'] = HTTPException(status_code=403, detail="Invalid token")
+            return
+
+        try:
+            async with async_session_maker() as db:
+                state['principal'] = await auth_verify_token(token, db, token_class=token_class)
+        except HTTPException as e:
+            state['auth_error'] = e
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http':
+            token_class = self.match(scope)
+            if token_class is not None:
+                await self.authenticate(scope, token_class)
+
+        await self.app(scope, receive, send)
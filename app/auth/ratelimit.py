@@ -0,0 +1,95 @@
+import importlib
+import math
+import time
+from collections import OrderedDict
+
+from fastapi import HTTPException
+
+from app.auth import normalize_login
+
+
+class RateLimitBackend:
+    """
+    Token bucket storage. Backends only need to implement hit(), so a store shared between workers
+    can replace the in-process one without touching the limiter.
+    """
+
+    async def hit(self, key: str, rate: float, burst: int) -> float:
+        """Consumes one token for key, returns 0 when allowed or seconds until a token is available."""
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+class MemoryRateLimitBackend(RateLimitBackend):
+    """
+    In-process token buckets. Keys are kept in access order, so idle buckets (which would be full again
+    anyway) are evicted from the front in O(1), and max_keys bounds memory under key floods.
+    """
+
+    def __init__(self, max_keys: int = 100_000, ttl: float = 3600.0):
+        self.max_keys = max_keys
+        self.ttl = ttl
+        self._buckets = OrderedDict()
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def _evict(self, now: float):
+        while self._buckets:
+            key, (_, updated) = next(iter(self._buckets.items()))
+            if now - updated < self.ttl and len(self._buckets) < self.max_keys:
+                break
+            del self._buckets[key]
+
+    async def hit(self, key: str, rate: float, burst: int) -> float:
+        now = time.monotonic()
+        bucket = self._buckets.pop(key, None)
+        self._evict(now)
+
+        if bucket is None:
+            tokens = float(burst)
+        else:
+            tokens, updated = bucket
+            tokens = min(float(burst), tokens + (now - updated) * rate)
+
+        if tokens >= 1.0:
+            self._buckets[key] = (tokens - 1.0, now)
+            return 0.0
+
+        self._buckets[key] = (tokens, now)
+        return (1.0 - tokens) / rate
+
+    def clear(self):
+        self._buckets.clear()
+
+
+def load_backend(path: str, **kwargs) -> RateLimitBackend:
+    module_name, class_name = path.rsplit('.', 1)
+    return getattr(importlib.import_module(module_name), class_name)(**kwargs)
+
+
+class LoginRateLimiter:
+    def __init__(self, backend: RateLimitBackend, ip_per_minute: float, ip_burst: int,
+                 login_per_minute: float, login_burst: int):
+        self.backend = backend
+        self.ip_rate = ip_per_minute / 60.0
+        self.ip_burst = ip_burst
+        self.login_rate = login_per_minute / 60.0
+        self.login_burst = login_burst
+        self.rejected = 0
+
+    def _limited(self, retry_after: float) -> HTTPException:
+        self.rejected += 1
+        return HTTPException(status_code=429, detail="Too many login attempts",
+                             headers={'Retry-After': str(max(1, math.ceil(retry_after)))})
+
+    async def check(self, ip: str, login: str):
+        retry_after = await self.backend.hit(f'ip:{ip}', self.ip_rate, self.ip_burst)
+        if retry_after:
+            raise self._limited(retry_after)
+
+        retry_after = await self.backend.hit(f'login:{normalize_login(login)}', self.login_rate, self.login_burst)
+        if retry_after:
+            raise self._limited(retry_after)
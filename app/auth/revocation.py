@@ -0,0 +1,273 @@
+import contextlib
+import fcntl
+import hashlib
+import heapq
+import mmap
+import os
+import struct
+import time
+from typing import Optional
+
+from app.config import settings
+
+
+class RevocationList:
+    """
+    Revoked refresh token jtis that have not expired yet. Expired entries are pruned from an expiry heap
+    as they are passed, so memory follows the number of live revocations. is_revoked() answers None until
+    the list was loaded, callers fall back to the database then.
+    """
+
+    def __init__(self):
+        self.loaded = False
+        self._revoked = {}
+        self._expiry = []
+
+    def __len__(self):
+        return len(self._revoked)
+
+    def add(self, jti: str, expires_at: float):
+        now = time.time()
+        self.prune(now)
+        if expires_at <= now or jti in self._revoked:
+            return
+
+        self._revoked[jti] = expires_at
+        heapq.heappush(self._expiry, (expires_at, jti))
+
+    def is_revoked(self, jti: str) -> Optional[bool]:
+        if not self.loaded:
+            return None
+
+        self.prune()
+        return jti in self._revoked
+
+    def prune(self, now: Optional[float] = None) -> int:
+        now = time.time() if now is None else now
+        pruned = 0
+        while self._expiry and self._expiry[0][0] <= now:
+            _, jti = heapq.heappop(self._expiry)
+            self._revoked.pop(jti, None)
+            pruned += 1
+
+        return pruned
+
+    def load(self, revoked):
+        """Replaces the content with (jti, expires_at) pairs."""
+        self.clear()
+        for jti, expires_at in revoked:
+            self.add(jti, expires_at)
+        self.loaded = True
+
+    def clear(self):
+        self._revoked.clear()
+        self._expiry.clear()
+        self.loaded = False
+
+
+class MappedRevocationList:
+    """
+    Revocation list shared by every worker on a host through a memory-mapped file holding a fixed-size,
+    open addressing hash table of (jti digest, expiry) slots.
+
+    Writers serialize on an flock and bump a sequence counter around every change, readers take no lock
+    and retry when the counter moved under them (seqlock). Expired slots are reused by inserts and dropped
+    by prune(), which rebuilds the table. When the table runs out of slots the overflow flag makes
+    is_revoked() answer None, sending callers to the database.
+    """
+
+    MAGIC = b'RVKL'
+    VERSION = 1
+    HEADER = struct.Struct('<4sIQQQQ')
+    HEADER_SIZE = 64
+    SEQ_OFFSET = 16
+    COUNT_OFFSET = 24
+    FLAGS_OFFSET = 32
+    SLOT = struct.Struct('<16sd')
+    COUNTER = struct.Struct('<Q')
+
+    FLAG_LOADED = 1
+    FLAG_OVERFLOW = 2
+
+    MAX_LOAD = 0.75
+    READ_RETRIES = 1000
+
+    def __init__(self, path: str, slots: int):
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        self._file = os.fdopen(fd, 'r+b')
+
+        with self._locked():
+            if os.fstat(fd).st_size < self.HEADER_SIZE:
+                os.ftruncate(fd, self.HEADER_SIZE + slots * self.SLOT.size)
+                self._mm = mmap.mmap(fd, 0)
+                self.HEADER.pack_into(self._mm, 0, self.MAGIC, self.VERSION, slots, 0, 0, 0)
+            else:
+                self._mm = mmap.mmap(fd, 0)
+
+            magic, version, slots, _, _, _ = self.HEADER.unpack_from(self._mm, 0)
+            if magic != self.MAGIC or version != self.VERSION:
+                raise ValueError(f'{path} is not a revocation list file')
+
+        # the layout stored in the file wins over the configured size
+        self.slots = slots
+
+    def __len__(self):
+        now = time.time()
+        return sum(1 for _, expires_at in self._entries() if expires_at > now)
+
+    @property
+    def loaded(self) -> bool:
+        return bool(self._read(self.FLAGS_OFFSET) & self.FLAG_LOADED)
+
+    @staticmethod
+    def _digest(jti: str) -> bytes:
+        return hashlib.blake2b(jti.encode(), digest_size=16).digest()
+
+    def _read(self, offset: int) -> int:
+        return self.COUNTER.unpack_from(self._mm, offset)[0]
+
+    def _write(self, offset: int, value: int):
+        self.COUNTER.pack_into(self._mm, offset, value)
+
+    def _offset(self, index: int) -> int:
+        return self.HEADER_SIZE + index * self.SLOT.size
+
+    def _probe(self, digest: bytes):
+        start = int.from_bytes(digest[:8], 'little') % self.slots
+        for i in range(self.slots):
+            index = (start + i) % self.slots
+            yield index, *self.SLOT.unpack_from(self._mm, self._offset(index))
+
+    def _entries(self):
+        for index in range(self.slots):
+            digest, expires_at = self.SLOT.unpack_from(self._mm, self._offset(index))
+            if expires_at:
+                yield digest, expires_at
+
+    @contextlib.contextmanager
+    def _locked(self):
+        fcntl.flock(self._file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+
+    @contextlib.contextmanager
+    def _writing(self):
+        with self._locked():
+            seq = self._read(self.SEQ_OFFSET)
+            self._write(self.SEQ_OFFSET, seq + 1)
+            try:
+                yield
+            finally:
+                self._write(self.SEQ_OFFSET, seq + 2)
+
+    def _insert(self, digest: bytes, expires_at: float, now: float) -> bool:
+        free = None
+        for index, slot_digest, slot_expires_at in self._probe(digest):
+            if slot_digest == digest:
+                free = index
+                break
+
+            if not slot_expires_at:
+                if free is None:
+                    free = index
+                    self._write(self.COUNT_OFFSET, self._read(self.COUNT_OFFSET) + 1)
+                break
+
+            if free is None and slot_expires_at <= now:
+                free = index
+
+        if free is None:
+            return False
+
+        self.SLOT.pack_into(self._mm, self._offset(free), digest, expires_at)
+        return True
+
+    def _compact(self, now: float) -> int:
+        entries = list(self._entries())
+        live = [(digest, expires_at) for digest, expires_at in entries if expires_at > now]
+
+        self._mm[self.HEADER_SIZE:] = bytes(len(self._mm) - self.HEADER_SIZE)
+        self._write(self.COUNT_OFFSET, 0)
+        for digest, expires_at in live:
+            self._insert(digest, expires_at, now)
+
+        return len(entries) - len(live)
+
+    def _add(self, digest: bytes, expires_at: float, now: float):
+        if self._read(self.COUNT_OFFSET) >= self.slots * self.MAX_LOAD:
+            self._compact(now)
+
+        if not self._insert(digest, expires_at, now):
+            self._write(self.FLAGS_OFFSET, self._read(self.FLAGS_OFFSET) | self.FLAG_OVERFLOW)
+
+    def add(self, jti: str, expires_at: float):
+        now = time.time()
+        if expires_at <= now:
+            return
+
+        with self._writing():
+            self._add(self._digest(jti), expires_at, now)
+
+    def is_revoked(self, jti: str) -> Optional[bool]:
+        digest = self._digest(jti)
+        now = time.time()
+
+        for _ in range(self.READ_RETRIES):
+            seq = self._read(self.SEQ_OFFSET)
+            if seq & 1:
+                continue
+
+            flags = self._read(self.FLAGS_OFFSET)
+            if not flags & self.FLAG_LOADED or flags & self.FLAG_OVERFLOW:
+                revoked = None
+            else:
+                revoked = False
+                for _, slot_digest, slot_expires_at in self._probe(digest):
+                    if not slot_expires_at:
+                        break
+
+                    if slot_digest == digest and slot_expires_at > now:
+                        revoked = True
+                        break
+
+            if self._read(self.SEQ_OFFSET) == seq:
+                return revoked
+
+        return None
+
+    def prune(self, now: Optional[float] = None) -> int:
+        now = time.time() if now is None else now
+        with self._writing():
+            return self._compact(now)
+
+    def load(self, revoked):
+        """Merges (jti, expires_at) pairs, other workers may have loaded and extended the table already."""
+        now = time.time()
+        with self._writing():
+            for jti, expires_at in revoked:
+                if expires_at > now:
+                    self._add(self._digest(jti), expires_at, now)
+
+            self._write(self.FLAGS_OFFSET, self._read(self.FLAGS_OFFSET) | self.FLAG_LOADED)
+
+    def clear(self):
+        with self._writing():
+            self._mm[self.HEADER_SIZE:] = bytes(len(self._mm) - self.HEADER_SIZE)
+            self._write(self.COUNT_OFFSET, 0)
+            self._write(self.FLAGS_OFFSET, 0)
+
+    def close(self):
+        self._mm.close()
+        self._file.close()
+
+
+def create_revocation_list():
+    if settings.REVOCATION_STORE == 'mmap':
+        return MappedRevocationList(settings.REVOCATION_MMAP_PATH, settings.REVOCATION_MMAP_SLOTS)
+
+    return RevocationList()
+
+
+revocation_list = create_revocation_list()
@@ -1,14 +1,147 @@
 import datetime
+import hashlib
+import json
+import time
 import uuid
+from typing import NamedTuple
 
 import jwt
 
+from app.auth.cache import TTLCache
 from app.config import settings
+from app.metrics import registry
+
+REQUIRED_CLAIMS = ['uid', 'iss', 'exp', 'iat', 'jti']
+
+jwt_encode_duration = registry.histogram('auth_jwt_encode_seconds', 'Token signing time')
+jwt_decode_duration = registry.histogram('auth_jwt_decode_seconds', 'Token verification time, cache misses only')
+
+# validated payloads keyed by issuer and token digest, entries expire together with the token
+token_cache = TTLCache(settings.TOKEN_DECODE_CACHE_SIZE, ttl=0, name='token')
+
+
+def token_digest(token) -> bytes:
+    return hashlib.sha256(token.encode() if isinstance(token, str) else token).digest()
+
+
+class UnknownKeyError(jwt.exceptions.InvalidTokenError):
+    pass
+
+
+class SigningKey:
+    """
+    JWT key identified by the kid header. Key material is parsed once here instead of on every call,
+    HS* keys are symmetric secrets, everything else is an asymmetric key published through the JWKS.
+    Retired asymmetric keys only need the public half, they are kept around to verify.
+    """
+
+    def __init__(self, kid: str, algorithm: str, private_key=None, public_key=None):
+        self.kid = kid
+        self.algorithm = algorithm
+        self._algorithm = jwt.get_algorithm_by_name(algorithm)
+
+        self.private_key = self._algorithm.prepare_key(private_key) if private_key is not None else None
+        if public_key is not None:
+            self.public_key = self._algorithm.prepare_key(public_key)
+        elif self.symmetric:
+            self.public_key = self.private_key
+        else:
+            self.public_key = self.private_key.public_key()
+
+        self.jwk = None
+        if not self.symmetric:
+            self.jwk = json.loads(self._algorithm.to_jwk(self.public_key))
+            self.jwk.update({'kid': self.kid, 'alg': self.algorithm, 'use': 'sig'})
+
+    @property
+    def symmetric(self) -> bool:
+        return self.algorithm.startswith('HS')
+
+    def sign(self, payload: dict) -> str:
+        return jwt.encode(payload, self.private_key, algorithm=self.algorithm, headers={'kid': self.kid})
+
+    def verify(self, token, issuer) -> dict:
+        return jwt.decode(token, self.public_key, algorithms=[self.algorithm], issuer=issuer,
+                          options={'require': REQUIRED_CLAIMS})
+
+    @staticmethod
+    def from_config(kid: str, algorithm: str, key: str) -> 'SigningKey':
+        if algorithm.startswith('HS') or 'PRIVATE KEY' in key:
+            return SigningKey(kid, algorithm, private_key=key)
+        return SigningKey(kid, algorithm, public_key=key)
+
+    @staticmethod
+    def from_settings() -> 'SigningKey':
+        if settings.JWT_ALGORITHM.startswith('HS'):
+            return SigningKey(settings.JWT_KEY_ID, settings.JWT_ALGORITHM, settings.SECRET_KEY)
+
+        private_key = settings.JWT_PRIVATE_KEY
+        if not private_key and settings.JWT_PRIVATE_KEY_FILE:
+            with open(settings.JWT_PRIVATE_KEY_FILE) as f:
+                private_key = f.read()
+
+        return SigningKey(settings.JWT_KEY_ID, settings.JWT_ALGORITHM, private_key)
+
+
+class KeyRing:
+    """
+    Signing keys indexed by kid. New tokens are signed with the active key, decoding picks the key
+    named by the token header so tokens signed by a retired key stay valid until they expire.
+    Tokens without a kid (issued before key ids existed) are checked against the active key.
+    """
+
+    def __init__(self, active: SigningKey, retired=()):
+        self.active = active
+        self.keys = {}
+        for key in (*retired, active):
+            # a key sharing a kid would silently replace the other one
+            if key.kid in self.keys:
+                raise ValueError(f'duplicate key id {key.kid!r}, every rotation needs a new JWT_KEY_ID')
+            self.keys[key.kid] = key
+
+    def get(self, kid) -> SigningKey:
+        if kid is None:
+            return self.active
+
+        key = self.keys.get(kid)
+        if key is None:
+            raise UnknownKeyError('unknown key id')
+        return key
+
+    def sign(self, payload: dict) -> str:
+        with jwt_encode_duration.time():
+            return self.active.sign(payload)
+
+    def verify(self, token, issuer) -> dict:
+        with jwt_decode_duration.time():
+            kid = jwt.get_unverified_header(token).get('kid')
+            return self.get(kid).verify(token, issuer)
+
+    def jwks(self) -> dict:
+        return {'keys': [key.jwk for key in self.keys.values() if key.jwk]}
+
+    @staticmethod
+    def from_settings() -> 'KeyRing':
+        retired = [SigningKey.from_config(k['kid'], k.get('algorithm', settings.JWT_ALGORITHM), k['key'])
+                   for k in settings.JWT_RETIRED_KEYS]
+        return KeyRing(SigningKey.from_settings(), retired)
+
+
+key_ring = KeyRing.from_settings()
+
+
+def jwks() -> dict:
+    return key_ring.jwks()
+
+
+class MintedToken(NamedTuple):
+    token: str
+    claims: dict
 
 
 class Token:
     @staticmethod
-    def encode_token(payload, expiration, issuer):
+    def mint_token(payload, expiration, issuer) -> MintedToken:
         now = datetime.datetime.now(tz=datetime.timezone.utc)
         dt = now + expiration
 
@@ -19,18 +152,38 @@ class Token:
             'iss': issuer
         })
 
-        return jwt.encode(payload, settings.SECRET_KEY, algorithm='HS256')
+        return MintedToken(key_ring.sign(payload), payload)
+
+    @staticmethod
+    def encode_token(payload, expiration, issuer):
+        return Token.mint_token(payload, expiration, issuer).token
 
     @staticmethod
-    def decode_token(token, issuer):
-        return jwt.decode(token, settings.SECRET_KEY, algorithms='HS256', issuer=issuer,
-                          options={'require': ['uid', 'iss', 'exp', 'iat', 'jti', 'iss']})
+    def decode_token(token, issuer, use_cache=True):
+        use_cache = use_cache and token_cache.maxsize > 0
+        if use_cache:
+            key = (issuer, token_digest(token))
+            payload = token_cache.get(key)
+            if payload is not None:
+                return dict(payload)
+
+        payload = key_ring.verify(token, issuer)
+
+        if use_cache:
+            token_cache.set(key, payload, ttl=payload['exp'] - time.time())
+            payload = dict(payload)
+
+        return payload
 
 
 class AccessToken(Token):
     expire_time = datetime.timedelta(minutes=15)
     issuer = 'acc'
 
+    @staticmethod
+    def mint(payload):
+        return Token.mint_token(payload, expiration=AccessToken.expire_time, issuer=AccessToken.issuer)
+
     @staticmethod
     def encode(payload):
         return Token.encode_token(payload, expiration=AccessToken.expire_time, issuer=AccessToken.issuer)
@@ -44,6 +197,10 @@ class RefreshToken:
     expire_time = datetime.timedelta(days=30)
     issuer = 'ref'
 
+    @staticmethod
+    def mint(payload):
+        return Token.mint_token(payload, expiration=RefreshToken.expire_time, issuer=RefreshToken.issuer)
+
     @staticmethod
     def encode(payload):
         return Token.encode_token(payload, expiration=RefreshToken.expire_time, issuer=RefreshToken.issuer)
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from functools import lru_cache
 from typing import Any, Dict, List
 
@@ -17,9 +18,110 @@ class Config(BaseSettings):
     SECRET_KEY: str = os.environ.get('SECRET_KEY', '41f62834-0071-11e6-a247-000ec6c2372c')
     DATABASE_URL: str = os.environ.get('DATABASE_URL', 'sqlite+aiosqlite:///sqlite.db')
     SYNC_DATABASE_URL: str = os.environ.get('DATABASE_URL', 'sqlite:///sqlite.db')
+    # token signing, HS* algorithms sign with SECRET_KEY, EdDSA/ES256 use the PEM private key
+    # and publish the public key at /.well-known/jwks.json
+    JWT_ALGORITHM: str = 'HS256'
+    JWT_KEY_ID: str = 'default'
+    JWT_PRIVATE_KEY: str = ''
+    JWT_PRIVATE_KEY_FILE: str = ''
+    # keys still accepted for verification after a rotation, [{"kid": .., "algorithm": .., "key": ..}]
+    # where key is the old secret for HS*, or a public (or private) PEM. Rotating requires a new
+    # JWT_KEY_ID, kids must be unique across the active and retired keys or startup fails
+    JWT_RETIRED_KEYS: List[Dict[str, str]] = []
+    JWKS_MAX_AGE: int = 3600
     TITLE: str = "Boring WEB"
     VERSION: str = "0.1"
 
+    # connection pool, size and overflow also apply to sqlite file databases
+    DATABASE_POOL_SIZE: int = 5
+    DATABASE_MAX_OVERFLOW: int = 10
+    DATABASE_POOL_RECYCLE: int = 1800
+    DATABASE_POOL_PRE_PING: bool = False
+
+    # statements slower than this many seconds are logged with their parameters redacted, 0 disables
+    DATABASE_SLOW_QUERY_THRESHOLD: float = 0.5
+
+    # pragmas executed on every new sqlite connection
+    SQLITE_PRAGMAS: Dict[str, Any] = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -64 * 1024,
+        'busy_timeout': 5000,
+    }
+
+    # password hashing pool, 'thread' or 'process'; threads only help with the bcrypt package installed,
+    # passlib's os_crypt fallback holds the GIL while hashing
+    PASSWORD_HASH_EXECUTOR: str = 'thread'
+    PASSWORD_HASH_WORKERS: int = min(4, os.cpu_count() or 1)
+
+    # login admission control, requests over the limit wait up to LOGIN_MAX_WAIT seconds
+    LOGIN_MAX_CONCURRENCY: int = 8
+    LOGIN_MAX_QUEUE: int = 64
+    LOGIN_MAX_WAIT: float = 5.0
+
+    # login attempt rate limits, token buckets per client ip and per login string
+    LOGIN_RATE_LIMIT_ENABLED: bool = True
+    LOGIN_RATE_LIMIT_BACKEND: str = 'app.auth.ratelimit.MemoryRateLimitBackend'
+    LOGIN_RATE_LIMIT_MAX_KEYS: int = 100_000
+    LOGIN_RATE_LIMIT_IP_PER_MINUTE: float = 30
+    LOGIN_RATE_LIMIT_IP_BURST: int = 30
+    LOGIN_RATE_LIMIT_LOGIN_PER_MINUTE: float = 5
+    LOGIN_RATE_LIMIT_LOGIN_BURST: int = 10
+
+    # verified users cached by uid for access token checks, TTL bounds staleness across workers
+    PRINCIPAL_CACHE_SIZE: int = 10_000
+    PRINCIPAL_CACHE_TTL: float = 30.0
+
+    # logging goes through a queue to a background thread, json or text lines on stdout
+    LOG_FORMAT: str = 'json'
+    LOG_LEVEL: str = 'INFO'
+    LOG_LEVELS: Dict[str, str] = {}
+    # keep one in every N DEBUG lines per call site
+    LOG_DEBUG_SAMPLE_EVERY: int = 1
+
+    # in-process metrics in Prometheus text format at /metrics
+    METRICS_ENABLED: bool = True
+
+    # per-request spans, logged as one JSON line per request and optionally returned as a Server-Timing header
+    TRACING_ENABLED: bool = False
+    TRACING_LOG_ENABLED: bool = True
+    SERVER_TIMING_ENABLED: bool = True
+
+    # verify tokens in a pure ASGI middleware for routes depending on auth_access_principal/auth_refresh_principal
+    AUTH_MIDDLEWARE_ENABLED: bool = False
+
+    # maximum number of access tokens accepted by /auth/verify/batch
+    VERIFY_BATCH_MAX_TOKENS: int = 1000
+
+    # verified token payloads, 0 disables the cache
+    TOKEN_DECODE_CACHE_SIZE: int = 10_000
+
+    # keep revoked refresh tokens in memory, loaded on startup. 'memory' is per process,
+    # 'mmap' shares one table between all workers on the host through REVOCATION_MMAP_PATH
+    REVOCATION_CACHE_ENABLED: bool = True
+    REVOCATION_STORE: str = 'memory'
+    REVOCATION_MMAP_PATH: str = os.path.join(tempfile.gettempdir(), 'boring_web_revocations.bin')
+    REVOCATION_MMAP_SLOTS: int = 1 << 16
+
+    # keep a sha256 digest of issued refresh tokens, when disabled no token material is stored at all
+    REFRESH_TOKEN_STORE_DIGEST: bool = True
+
+    # write refresh token rows behind the request in batched inserts instead of committing on every login
+    # requires REVOCATION_CACHE_ENABLED with a shared REVOCATION_STORE, startup fails with 'memory'
+    REFRESH_TOKEN_WRITE_BEHIND: bool = False
+    REFRESH_TOKEN_QUEUE_SIZE: int = 10_000
+    REFRESH_TOKEN_QUEUE_BATCH: int = 500
+    REFRESH_TOKEN_QUEUE_INTERVAL: float = 1.0
+
+    # background removal of expired refresh tokens, deleted in batches with a pause in between. The first
+    # run is one interval after startup, workers on a host take turns through TOKEN_SWEEP_LOCK_PATH ('' disables)
+    TOKEN_SWEEP_ENABLED: bool = True
+    TOKEN_SWEEP_INTERVAL: float = 3600.0
+    TOKEN_SWEEP_LOCK_PATH: str = os.path.join(tempfile.gettempdir(), 'boring_web_token_sweep.lock')
+    TOKEN_SWEEP_BATCH_SIZE: int = 1000
+    TOKEN_SWEEP_BATCH_PAUSE: float = 0.1
+
     ALLOWED_HOSTS: List[str] = ["*"]
 
     @property
@@ -33,6 +135,8 @@ class Config(BaseSettings):
 
 class DevelopmentConfig(Config):
     DEBUG = True
+    LOG_FORMAT = 'text'
+    LOG_LEVELS: Dict[str, str] = {'sqlalchemy.engine': 'INFO'}
 
 
 class TestingConfig(Config):
@@ -1,14 +1,158 @@
 import logging
-import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional
 
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from sqlmodel import create_engine, Session
 
 from app.config import settings
+from app.metrics import registry
 
-async_engine = create_async_engine(settings.DATABASE_URL, echo=settings.DEBUG, future=True)
-engine = create_engine(settings.SYNC_DATABASE_URL, echo=settings.DEBUG)
+logger = logging.getLogger(__name__)
+
+db_query_duration = registry.histogram('db_query_duration_seconds', 'Statement execution time', ['engine'])
+db_pool_checkout_duration = registry.histogram('db_pool_checkout_seconds', 'Time spent waiting for a pooled connection')
+db_pool_checked_out = registry.gauge('db_pool_checked_out', 'Connections currently checked out', ['engine'])
+
+current_queries: ContextVar[Optional['QueryCounter']] = ContextVar('current_queries', default=None)
+
+
+class QueryCounter:
+    __slots__ = ('count', 'duration', 'statements')
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements: List[str] = []
+
+
+@contextmanager
+def count_queries():
+    """Counts the statements executed within the block, including those of tasks started inside it."""
+    counter = QueryCounter()
+    token = current_queries.set(counter)
+    try:
+        yield counter
+    finally:
+        current_queries.reset(token)
+
+
+def redact_parameters(parameters):
+    # values may be credentials or token digests, only their types are logged
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (dict, list, tuple)):
+            return [redact_parameters(p) for p in parameters[:3]] + (['...'] if len(parameters) > 3 else [])
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+
+class InstrumentedQueuePool(QueuePool):
+    _sqla_logger_namespace = 'sqlalchemy.pool.impl.QueuePool'
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            db_pool_checkout_duration.observe(time.perf_counter() - started)
+
+
+class InstrumentedAsyncAdaptedQueuePool(AsyncAdaptedQueuePool):
+    _sqla_logger_namespace = 'sqlalchemy.pool.impl.AsyncAdaptedQueuePool'
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            db_pool_checkout_duration.observe(time.perf_counter() - started)
+
+
+def engine_kwargs(database_url: str, is_async: bool) -> dict:
+    kwargs = {
+        'pool_recycle': settings.DATABASE_POOL_RECYCLE,
+        'pool_pre_ping': settings.DATABASE_POOL_PRE_PING,
+    }
+
+    url = make_url(database_url)
+    if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+        # in-memory databases live inside a single connection, keep the dialect default pool
+        return kwargs
+
+    # sqlite file databases default to NullPool, which reconnects (and re-runs pragmas) on every checkout,
+    # other dialects to the same queue pools, these also time how long a checkout waits
+    kwargs.update({
+        'poolclass': InstrumentedAsyncAdaptedQueuePool if is_async else InstrumentedQueuePool,
+        'pool_size': settings.DATABASE_POOL_SIZE,
+        'max_overflow': settings.DATABASE_MAX_OVERFLOW,
+    })
+    if url.get_backend_name() == 'sqlite' and not is_async:
+        # pooled pysqlite connections are handed to whichever thread checks them out next
+        kwargs['connect_args'] = {'check_same_thread': False}
+    return kwargs
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for pragma, value in settings.SQLITE_PRAGMAS.items():
+        cursor.execute(f'PRAGMA {pragma}={value}')
+    cursor.close()
+
+
+def instrument_engine(sync_engine: Engine, name: str):
+    query_duration = db_query_duration.labels(name)
+
+    @event.listens_for(sync_engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._query_started = time.perf_counter()
+
+    @event.listens_for(sync_engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context._query_started
+        query_duration.observe(elapsed)
+
+        counter = current_queries.get()
+        if counter is not None:
+            counter.count += 1
+            counter.duration += elapsed
+            counter.statements.append(statement)
+
+        if settings.DATABASE_SLOW_QUERY_THRESHOLD and elapsed >= settings.DATABASE_SLOW_QUERY_THRESHOLD:
+            logger.warning({
+                'message': 'slow query',
+                'engine': name,
+                'duration_ms': round(elapsed * 1000, 3),
+                'statement': statement,
+                'parameters': redact_parameters(parameters),
+            })
+
+    if hasattr(sync_engine.pool, 'checkedout'):
+        db_pool_checked_out.labels(name).set_function(sync_engine.pool.checkedout)
+
+
+def configure_engine(sync_engine: Engine, name: str):
+    if sync_engine.dialect.name == 'sqlite':
+        event.listen(sync_engine, 'connect', set_sqlite_pragmas)
+
+    instrument_engine(sync_engine, name)
+
+
+async_engine = create_async_engine(settings.DATABASE_URL, future=True,
+                                   **engine_kwargs(settings.DATABASE_URL, is_async=True))
+engine = create_engine(settings.SYNC_DATABASE_URL, **engine_kwargs(settings.SYNC_DATABASE_URL, is_async=False))
+
+configure_engine(async_engine.sync_engine, 'async')
+configure_engine(engine, 'sync')
+
+async_session_maker = sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False, autocommit=False)
 
 
 def get_local_session() -> Session:
@@ -16,7 +160,8 @@ def get_local_session() -> Session:
 
 
 async def get_async_session() -> AsyncSession:
-    print(f'opening database {settings.DATABASE_URL} {os.getcwd()}')
-    async_session = sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False, autocommit=False)
-    async with async_session() as session:
+    # FastAPI caches dependency results per request, every dependency asking for a session
+    # within one request shares this one
+    logger.debug('opening database session')
+    async with async_session_maker() as session:
         yield session
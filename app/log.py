@@ -0,0 +1,117 @@
+import copy
+import datetime
+import itertools
+import json
+import logging
+import queue
+import sys
+from collections import defaultdict
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+from app.config import settings
+
+# attributes every LogRecord has, anything else was passed through extra= and is added to the JSON line
+RECORD_ATTRIBUTES = set(logging.LogRecord('', 0, '', 0, '', (), None).__dict__) | {'message', 'asctime'}
+
+listener: Optional[QueueListener] = None
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line, dict messages are merged into the object instead of being stringified."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = {
+            'time': datetime.datetime.fromtimestamp(record.created, tz=datetime.timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+        }
+        if isinstance(record.msg, dict):
+            line.update(record.msg)
+        else:
+            line['message'] = record.getMessage()
+
+        for key, value in record.__dict__.items():
+            if key not in RECORD_ATTRIBUTES and not key.startswith('_'):
+                line[key] = value
+
+        if record.exc_info:
+            line['exc_info'] = self.formatException(record.exc_info)
+        if record.stack_info:
+            line['stack_info'] = self.formatStack(record.stack_info)
+
+        return json.dumps(line, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps one in every `every` DEBUG records per call site, other levels always pass."""
+
+    def __init__(self, every: int):
+        super().__init__()
+        self.every = max(1, every)
+        self._counters = defaultdict(itertools.count)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.every == 1:
+            return True
+        # msg can be a dict, which is unhashable, the call site identifies the message just as well
+        return next(self._counters[(record.name, record.pathname, record.lineno)]) % self.every == 0
+
+
+class StdoutHandler(logging.StreamHandler):
+    # resolves sys.stdout on every write, so redirected or captured output is followed
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+
+class DeferredQueueHandler(QueueHandler):
+    # the stdlib handler formats the message before enqueueing, on the caller's thread;
+    # records stay in this process, so formatting is left to the listener thread
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return copy.copy(record)
+
+
+def configure_logging() -> QueueListener:
+    """
+    Routes all records through a queue, formatting and stream writes happen on the listener thread
+    instead of the event loop. Safe to call more than once.
+    """
+    global listener
+    if listener is not None:
+        return listener
+
+    stream = StdoutHandler()
+    if settings.LOG_FORMAT == 'json':
+        stream.setFormatter(JSONFormatter())
+    else:
+        stream.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s %(message)s'))
+
+    log_queue = queue.SimpleQueue()
+    handler = DeferredQueueHandler(log_queue)
+    if settings.LOG_DEBUG_SAMPLE_EVERY > 1:
+        handler.addFilter(SamplingFilter(settings.LOG_DEBUG_SAMPLE_EVERY))
+
+    root = logging.getLogger()
+    root.addHandler(handler)
+    root.setLevel(settings.LOG_LEVEL)
+    for name, level in settings.LOG_LEVELS.items():
+        logging.getLogger(name).setLevel(level)
+
+    listener = QueueListener(log_queue, stream, respect_handler_level=True)
+    listener.start()
+    return listener
+
+
+def shutdown_logging():
+    global listener
+    if listener is not None:
+        # flushes whatever is still queued
+        listener.stop()
+        logging.getLogger().handlers = [h for h in logging.getLogger().handlers
+                                        if not isinstance(h, DeferredQueueHandler)]
+        listener = None
@@ -1,2 +1,2 @@
-from app.models.user import User
-from app.models.token import UserRefreshToken
+from app.models.user import User, UserLoginKey
+from app.models.token import UserRefreshToken, refresh_token_queue
@@ -1,37 +1,237 @@
+import asyncio
 import datetime
+import logging
+from collections import OrderedDict
 from typing import Optional
 
+from sqlalchemy import Column, Index, LargeBinary, delete, insert, update
+from sqlalchemy.exc import DataError, IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlmodel import SQLModel, Field
+from sqlmodel import SQLModel, Field, select
 
-from app.auth.tokens import RefreshToken
+from app.auth.revocation import revocation_list
+from app.auth.tokens import RefreshToken, MintedToken, token_digest
+from app.config import settings
+from app.database import async_session_maker
 from app.models import User
+from app.tracing import span, traced
+
+logger = logging.getLogger(__name__)
 
 
 class UserRefreshToken(SQLModel, table=True):
+    __table_args__ = (
+        Index('ix_userrefreshtoken_user_blacklisted', 'user', 'blacklisted'),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
-    token: str
+    # sha256 of the raw token, the token itself is never needed again once issued
+    token_digest: Optional[bytes] = Field(default=None, sa_column=Column(LargeBinary(32), nullable=True))
     user: int = Field(foreign_key="user.id")
-    jti: str = Field(max_length=255)
+    jti: str = Field(max_length=255, index=True, unique=True)
     created_at: datetime.datetime
-    expires_at: datetime.datetime
+    expires_at: datetime.datetime = Field(index=True)
     blacklisted_at: datetime.datetime = Field(nullable=True)
     blacklisted: bool = False
     ip_address: str = Field(default="", max_length=39)
     user_agent: str = Field(default="", max_length=255)
 
     @staticmethod
-    async def from_token(db: AsyncSession, user: User, token, ip_address=None, user_agent=None):
-        payload = RefreshToken.decode(token)
-        ut = UserRefreshToken(
-            token=token,
-            user=user.id,
-            jti=payload.get('jti'),
-            user_id=payload.get('uid'),
-            user_agent=user_agent,
-            created_at=datetime.datetime.fromtimestamp(payload.get('iat')),
-            expires_at=datetime.datetime.fromtimestamp(payload.get('exp')),
-            ip_address=ip_address
-        )
-        db.add(ut)
+    @traced('refresh_token_store')
+    async def from_token(db: AsyncSession, user: User, token: MintedToken, ip_address=None, user_agent=None,
+                         commit=True):
+        if isinstance(token, str):
+            token = MintedToken(token, RefreshToken.decode(token))
+
+        payload = token.claims
+        values = {
+            'token_digest': token_digest(token.token) if settings.REFRESH_TOKEN_STORE_DIGEST else None,
+            'user': user.id,
+            'jti': payload.get('jti'),
+            'user_agent': user_agent or '',
+            'created_at': datetime.datetime.fromtimestamp(payload.get('iat')),
+            'expires_at': datetime.datetime.fromtimestamp(payload.get('exp')),
+            'blacklisted_at': None,
+            'blacklisted': False,
+            'ip_address': ip_address or '',
+        }
+
+        # session metadata may be written behind, falls back to a direct insert when the queue is full
+        if settings.REFRESH_TOKEN_WRITE_BEHIND and refresh_token_queue.put(values):
+            return
+
+        db.add(UserRefreshToken(**values))
+        if commit:
+            with span('refresh_token_commit'):
+                await db.commit()
+
+    @staticmethod
+    async def purge_expired(db: AsyncSession, batch_size: int) -> int:
+        # walks the expires_at index and deletes by primary key, keeping each write transaction short
+        query = select(UserRefreshToken.id) \
+            .where(UserRefreshToken.expires_at < datetime.datetime.now()) \
+            .order_by(UserRefreshToken.expires_at) \
+            .limit(batch_size)
+        ids = (await db.execute(query)).scalars().all()
+        if not ids:
+            return 0
+
+        await db.execute(delete(UserRefreshToken).where(UserRefreshToken.id.in_(ids))
+                         .execution_options(synchronize_session=False))
         await db.commit()
+        return len(ids)
+
+
+class RefreshTokenWriteQueue:
+    """
+    Write-behind buffer for refresh token rows, flushed with multi-row inserts once batch_size rows are
+    waiting or every interval seconds, and drained on shutdown.
+
+    Rows stay visible through revoke() until their insert committed, a revocation that lands while a row
+    is queued or being flushed is written with (or right after) it. Revocations of rows other workers
+    still hold are picked up from the shared revocation list when the row is flushed. When a batch insert
+    fails its rows are retried one by one, rows the database still rejects are logged and dropped.
+    """
+
+    def __init__(self, maxsize: int, batch_size: int, interval: float):
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.interval = interval
+        self.flushed = 0
+        self.dropped = 0
+        self._pending = OrderedDict()
+        self._lock: Optional[asyncio.Lock] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self):
+        return len(self._pending)
+
+    def put(self, values: dict) -> bool:
+        if len(self._pending) >= self.maxsize:
+            return False
+
+        self._pending[values['jti']] = values
+        if self._wakeup is not None and len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    def is_revoked(self, jti: str) -> Optional[bool]:
+        values = self._pending.get(jti)
+        return None if values is None else values['blacklisted']
+
+    def revoke(self, jti: str) -> Optional[bool]:
+        """Same contract as auth_revoke_refresh_token(), None when the row is not queued here."""
+        values = self._pending.get(jti)
+        if values is None:
+            return None
+
+        if values['blacklisted']:
+            return False
+
+        values['blacklisted'] = True
+        values['blacklisted_at'] = datetime.datetime.utcnow()
+        return True
+
+    async def flush(self) -> int:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        async with self._lock:
+            batch = [self._pending[jti] for jti in list(self._pending)[:self.batch_size]]
+            if not batch:
+                return 0
+
+            rows = []
+            for values in batch:
+                if not values['blacklisted'] and revocation_list.is_revoked(values['jti']):
+                    values['blacklisted'] = True
+                    values['blacklisted_at'] = datetime.datetime.utcnow()
+                rows.append(dict(values))
+
+            async with async_session_maker() as db:
+                stored = await self._insert(db, batch, rows)
+
+                # revoked while the insert was in flight
+                late = [values for values, row in stored if values['blacklisted'] and not row['blacklisted']]
+                for values in late:
+                    await db.execute(update(UserRefreshToken.__table__)
+                                     .where(UserRefreshToken.jti == values['jti'])
+                                     .values(blacklisted=True, blacklisted_at=values['blacklisted_at']))
+                if late:
+                    await db.commit()
+
+            for values in batch:
+                self._pending.pop(values['jti'], None)
+
+            self.flushed += len(stored)
+            self.dropped += len(batch) - len(stored)
+            return len(batch)
+
+    async def _insert(self, db: AsyncSession, batch: list, rows: list) -> list:
+        try:
+            await db.execute(insert(UserRefreshToken.__table__), rows)
+            await db.commit()
+            return list(zip(batch, rows))
+        except (IntegrityError, DataError):
+            await db.rollback()
+            logger.warning('refresh token batch insert failed, retrying %d rows one by one', len(rows))
+
+        # one bad row must not keep the rest of the batch, and everything queued behind it, from being stored
+        stored = []
+        for values, row in zip(batch, rows):
+            try:
+                await db.execute(insert(UserRefreshToken.__table__), [row])
+                await db.commit()
+            except (IntegrityError, DataError):
+                await db.rollback()
+                logger.exception('dropping queued refresh token %s of user %s', row['jti'], row['user'])
+            else:
+                stored.append((values, row))
+
+        return stored
+
+    async def drain(self):
+        while self._pending:
+            await self.flush()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            try:
+                await self.drain()
+            except Exception:
+                logger.exception('refresh token flush failed')
+
+    async def start(self):
+        if settings.REFRESH_TOKEN_WRITE_BEHIND and \
+                (not settings.REVOCATION_CACHE_ENABLED or settings.REVOCATION_STORE == 'memory'):
+            # a token still queued on another worker is not in the database yet, only a revocation list
+            # shared between workers stops it from being rotated on two of them
+            raise RuntimeError("REFRESH_TOKEN_WRITE_BEHIND needs REVOCATION_CACHE_ENABLED and a shared "
+                               "REVOCATION_STORE, not 'memory'")
+
+        if settings.REFRESH_TOKEN_WRITE_BEHIND and self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._wakeup = None
+
+        await self.drain()
+
+
+refresh_token_queue = RefreshTokenWriteQueue(settings.REFRESH_TOKEN_QUEUE_SIZE, settings.REFRESH_TOKEN_QUEUE_BATCH,
+                                             settings.REFRESH_TOKEN_QUEUE_INTERVAL)
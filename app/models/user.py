@@ -1,9 +1,11 @@
 from typing import Optional
 
-from pydantic import PrivateAttr
+from sqlalchemy import event, inspect
 from sqlmodel import SQLModel, Field
 
-from app.auth import verify_password, get_hashed_password
+from app.auth import verify_password, get_hashed_password, verify_password_async, get_hashed_password_async, \
+    normalize_login
+from app.auth.principal import invalidate_principal
 
 
 class User(SQLModel, table=True):
@@ -11,20 +13,52 @@ class User(SQLModel, table=True):
     password: Optional[str]
     is_superuser: bool = False
     is_active: bool = False
-    username: str
+    username: str = Field(index=True, unique=True)
     name: str
-    email: str
-    _token: str = PrivateAttr(default=None)
+    email: str = Field(index=True, unique=True)
 
     @property
-    def token(self):
-        return self._token
-
-    def set_token(self, token):
-        self._token = token
+    def login_keys(self):
+        return {normalize_login(self.username), normalize_login(self.email)}
 
     def set_password(self, password):
         self.password = get_hashed_password(password)
 
     def check_password(self, password):
         return verify_password(password, self.password)
+
+    async def set_password_async(self, password):
+        self.password = await get_hashed_password_async(password)
+
+    async def check_password_async(self, password):
+        return await verify_password_async(password, self.password)
+
+
+class UserLoginKey(SQLModel, table=True):
+    # normalized username and email, login resolves with a single primary key probe
+    key: str = Field(primary_key=True, max_length=255)
+    user: int = Field(foreign_key="user.id", index=True)
+
+
+@event.listens_for(User, 'after_insert')
+def user_insert_login_keys(mapper, connection, target: User):
+    connection.execute(UserLoginKey.__table__.insert(), [{'key': key, 'user': target.id} for key in target.login_keys])
+
+
+@event.listens_for(User, 'after_update')
+def user_update_login_keys(mapper, connection, target: User):
+    state = inspect(target)
+    if state.attrs.username.history.has_changes() or state.attrs.email.history.has_changes():
+        user_delete_login_keys(mapper, connection, target)
+        user_insert_login_keys(mapper, connection, target)
+
+
+@event.listens_for(User, 'before_delete')
+def user_delete_login_keys(mapper, connection, target: User):
+    connection.execute(UserLoginKey.__table__.delete().where(UserLoginKey.user == target.id))
+
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def user_invalidate_principal(mapper, connection, target: User):
+    invalidate_principal(target.id)
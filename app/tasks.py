@@ -0,0 +1,103 @@
+import asyncio
+import contextlib
+import fcntl
+import logging
+from typing import Optional
+
+from app.auth.revocation import revocation_list
+from app.config import settings
+from app.database import async_session_maker
+from app.models import UserRefreshToken
+
+logger = logging.getLogger(__name__)
+
+
+async def purge_expired_refresh_tokens(batch_size: int = None, batch_pause: float = None) -> int:
+    batch_size = batch_size or settings.TOKEN_SWEEP_BATCH_SIZE
+    batch_pause = settings.TOKEN_SWEEP_BATCH_PAUSE if batch_pause is None else batch_pause
+
+    purged = 0
+    while True:
+        async with async_session_maker() as db:
+            deleted = await UserRefreshToken.purge_expired(db, batch_size)
+
+        purged += deleted
+        if deleted < batch_size:
+            break
+
+        # give other writers a chance between batches
+        await asyncio.sleep(batch_pause)
+
+    pruned = revocation_list.prune()
+    logger.info('purged %d expired refresh tokens, pruned %d revocations', purged, pruned)
+    return purged
+
+
+class RefreshTokenSweeper:
+    """
+    Purges expired refresh tokens every interval seconds, the first run one interval after startup so a
+    deploy doesn't start every worker's sweep at once. Workers on a host take turns through a non-blocking
+    flock on lock_path, a run is skipped while another worker holds it.
+    """
+
+    def __init__(self, interval: float, lock_path: str = ''):
+        self.interval = interval
+        self.lock_path = lock_path
+        self.runs = 0
+        self.skipped = 0
+        self.last_purged = 0
+        self._task: Optional[asyncio.Task] = None
+
+    @contextlib.contextmanager
+    def _exclusive(self):
+        if not self.lock_path:
+            yield True
+            return
+
+        with open(self.lock_path, 'a') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    async def sweep(self) -> bool:
+        with self._exclusive() as acquired:
+            if not acquired:
+                self.skipped += 1
+                logger.debug('refresh token sweep running in another worker, skipped')
+                return False
+
+            self.last_purged = await purge_expired_refresh_tokens()
+            self.runs += 1
+            return True
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+
+            try:
+                await self.sweep()
+            except Exception:
+                logger.exception('refresh token sweep failed')
+
+    async def start(self):
+        if settings.TOKEN_SWEEP_ENABLED and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+refresh_token_sweeper = RefreshTokenSweeper(settings.TOKEN_SWEEP_INTERVAL, settings.TOKEN_SWEEP_LOCK_PATH)
@@ -1,17 +1,21 @@
 import asyncio
 import json
+from contextlib import contextmanager
 from typing import Generator
 
 import httpx
 import pytest
 import pytest_asyncio
 from httpx import AsyncClient
-from sqlalchemy.orm import sessionmaker
 from sqlmodel import SQLModel
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app import app, settings
-from app.database import async_engine
+from app.auth.login import login_rate_limiter
+from app.auth.principal import principal_cache
+from app.auth.revocation import revocation_list
+from app.auth.tokens import token_cache
+from app.database import async_engine, async_session_maker, count_queries
 
 
 @pytest.fixture(scope="session")
@@ -21,6 +25,15 @@ def event_loop(request) -> Generator:  # noqa: indirect usage
     loop.close()
 
 
+@pytest.fixture(autouse=True)
+def reset_auth_state():
+    login_rate_limiter.backend.clear()
+    principal_cache.clear()
+    token_cache.clear()
+    revocation_list.clear()
+    revocation_list.load([])
+
+
 @pytest_asyncio.fixture
 async def async_client():
     settings.TESTING = True
@@ -30,9 +43,7 @@ async def async_client():
 
 @pytest_asyncio.fixture(scope="function")
 async def async_session() -> AsyncSession:
-    session = sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
-
-    async with session() as s:
+    async with async_session_maker() as s:
         async with async_engine.begin() as conn:
             await conn.run_sync(SQLModel.metadata.create_all)
 
@@ -44,6 +55,20 @@ async def async_session() -> AsyncSession:
     await async_engine.dispose()
 
 
+@pytest.fixture
+def max_queries():
+    """Fails the test when the block runs more statements than allowed, listing the ones that ran."""
+    @contextmanager
+    def check(limit: int):
+        with count_queries() as counter:
+            yield counter
+
+        assert counter.count <= limit, \
+            f'{counter.count} queries, expected at most {limit}:\n' + '\n'.join(counter.statements)
+
+    return check
+
+
 def response_json(response: httpx.Response) -> dict:
     try:
         return json.loads(response.text)
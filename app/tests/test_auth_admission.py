@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette import status
+
+from app.auth import login
+from app.auth.admission import ConcurrencyLimiter
+from app.models.user import User
+from app.tests.conftest import app
+
+
+@pytest.mark.asyncio
+class TestConcurrencyLimiter:
+
+    async def test_limiter_counts(self):
+        limiter = ConcurrencyLimiter(1, 2, 1.0)
+        await limiter.acquire()
+
+        waiter = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        assert limiter.stats()['in_flight'] == 1
+        assert limiter.stats()['queued'] == 1
+
+        limiter.release()
+        await waiter
+        assert limiter.in_flight == 1
+        assert limiter.queued == 0
+
+        limiter.release()
+        assert limiter.in_flight == 0
+
+    async def test_limiter_queue_full(self):
+        limiter = ConcurrencyLimiter(1, 0, 1.0)
+        await limiter.acquire()
+
+        with pytest.raises(HTTPException) as exc:
+            await limiter.acquire()
+
+        assert exc.value.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert exc.value.headers['Retry-After'] == '1'
+        assert limiter.rejected == 1
+
+    async def test_limiter_max_wait(self):
+        limiter = ConcurrencyLimiter(1, 1, 0.01)
+        await limiter.acquire()
+
+        with pytest.raises(HTTPException):
+            await limiter.acquire()
+
+        assert limiter.queued == 0
+        limiter.release()
+        assert limiter.in_flight == 0
+
+
+@pytest.mark.asyncio
+class TestLoginAdmission:
+
+    @pytest.fixture(autouse=True)
+    async def set_up(self, async_session: AsyncSession, monkeypatch):
+        user = User(username='testuser', name="test", email='test@test.com')
+        user.set_password('testpassword')
+        async_session.add(user)
+        await async_session.commit()
+
+        monkeypatch.setattr(login, 'login_limiter', ConcurrencyLimiter(1, 0, 1.0))
+
+    async def test_login_overloaded(self, async_client: AsyncClient):
+        await login.login_limiter.acquire()
+
+        response = await async_client.post(app.url_path_for('login_token'),
+                                           json={'login': 'testuser', 'password': 'testpassword'})
+
+        assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert response.headers['retry-after'] == '1'
+        login.login_limiter.release()
+
+    async def test_login_slot_released(self, async_client: AsyncClient):
+        for _ in range(2):
+            response = await async_client.post(app.url_path_for('login_token'),
+                                               json={'login': 'testuser', 'password': 'testpassword'})
+            assert response.status_code == status.HTTP_200_OK
+
+        assert login.login_limiter.in_flight == 0
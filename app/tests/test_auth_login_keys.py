@@ -0,0 +1,55 @@
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
+from starlette import status
+
+from app.models.user import User, UserLoginKey
+from app.tests.conftest import app
+
+
+@pytest.mark.asyncio
+class TestLoginKeys:
+
+    @pytest.fixture(autouse=True)
+    async def set_up(self, async_session: AsyncSession):
+        user = User(username='TestUser', name="test", email='Test@Test.com')
+        user.set_password('testpassword')
+        async_session.add(user)
+        await async_session.commit()
+
+    async def test_login_keys_created(self, async_session: AsyncSession):
+        query = select(UserLoginKey.key).where(UserLoginKey.user == 1)
+        keys = (await async_session.execute(query)).scalars().all()
+
+        assert set(keys) == {'testuser', 'test@test.com'}
+
+    async def test_login_keys_updated(self, async_session: AsyncSession):
+        user = (await async_session.execute(select(User))).scalars().first()
+        user.username = 'renamed'
+        async_session.add(user)
+        await async_session.commit()
+
+        query = select(UserLoginKey.key).where(UserLoginKey.user == 1)
+        keys = (await async_session.execute(query)).scalars().all()
+
+        assert set(keys) == {'renamed', 'test@test.com'}
+
+    async def test_login_keys_deleted(self, async_session: AsyncSession):
+        user = (await async_session.execute(select(User))).scalars().first()
+        await async_session.delete(user)
+        await async_session.commit()
+
+        keys = (await async_session.execute(select(UserLoginKey))).scalars().all()
+        assert keys == []
+
+    @pytest.mark.parametrize('login', ['testuser', 'TESTUSER', ' TestUser ', 'test@test.com', 'TEST@test.COM'])
+    async def test_login_case_insensitive(self, async_client: AsyncClient, login):
+        response = await async_client.post(app.url_path_for('login_token'),
+                                           json={'login': login, 'password': 'testpassword'})
+        assert response.status_code == status.HTTP_200_OK
+
+    async def test_login_wrong_key(self, async_client: AsyncClient):
+        response = await async_client.post(app.url_path_for('login_token'),
+                                           json={'login': 'test', 'password': 'testpassword'})
+        assert response.status_code == status.HTTP_403_FORBIDDEN
@@ -1,10 +1,13 @@
+from unittest import mock
+
 import pytest
 from httpx import AsyncClient
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import select
 from starlette import status
 
-from app.auth.tokens import AccessToken, RefreshToken
+from app.auth.tokens import AccessToken, RefreshToken, token_digest
+from app.config import settings
 from app.models import UserRefreshToken
 from app.models.user import User
 from app.tests.conftest import app, response_json
@@ -15,7 +18,7 @@ class TestTokenLogin:
 
     @pytest.fixture(autouse=True)
     async def set_up(self, async_session: AsyncSession):
-        user = User(username='testuser', name="test", email='test@test.com')
+        user = User(username='testuser', name="test", email='test@test.com', is_active=True)
         user.set_password('testpassword')
         async_session.add(user)
         await async_session.commit()
@@ -71,3 +74,29 @@ class TestTokenLogin:
         assert element.user == 1
         assert element.blacklisted is False
         assert element.ip_address == '127.0.0.1'
+
+    async def test_login_refresh_token_not_decoded(self, async_client: AsyncClient, async_session: AsyncSession):
+        with mock.patch.object(RefreshToken, 'decode', side_effect=AssertionError('decoded')):
+            response = await async_client.post(app.url_path_for('login_token'),
+                                               json={'login': 'testuser', 'password': 'testpassword'})
+        assert response.status_code == status.HTTP_200_OK
+
+        element = (await async_session.execute(select(UserRefreshToken))).scalars().first()
+        assert element.jti == RefreshToken.decode(response_json(response)['refresh_token'])['jti']
+
+    async def test_login_refresh_token_digest(self, async_client: AsyncClient, async_session: AsyncSession):
+        response = await async_client.post(app.url_path_for('login_token'),
+                                           json={'login': 'testuser', 'password': 'testpassword'})
+        assert response.status_code == status.HTTP_200_OK
+
+        element = (await async_session.execute(select(UserRefreshToken))).scalars().first()
+        assert element.token_digest == token_digest(response_json(response)['refresh_token'])
+
+    async def test_login_refresh_token_no_digest(self, async_client: AsyncClient, async_session: AsyncSession):
+        with mock.patch.object(settings, 'REFRESH_TOKEN_STORE_DIGEST', False):
+            response = await async_client.post(app.url_path_for('login_token'),
+                                               json={'login': 'testuser', 'password': 'testpassword'})
+        assert response.status_code == status.HTTP_200_OK
+
+        element = (await async_session.execute(select(UserRefreshToken))).scalars().first()
+        assert element.token_digest is None
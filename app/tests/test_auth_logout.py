@@ -15,7 +15,7 @@ class TestLogout:
 
     @pytest.fixture(autouse=True)
     async def set_up(self, async_session: AsyncSession):
-        user = User(username='testuser', name="test", email='test@test.com')
+        user = User(username='testuser', name="test", email='test@test.com', is_active=True)
         user.set_password('testpassword')
         async_session.add(user)
         await async_session.commit()
@@ -0,0 +1,96 @@
+from unittest import mock
+
+import pytest
+import pytest_asyncio
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette import status
+
+from app.auth import login
+from app.auth.middleware import AuthenticationMiddleware, scope_token
+from app.auth.tokens import AccessToken, RefreshToken
+from app.models.user import User
+from app.tests.conftest import app
+
+
+def test_scope_token():
+    scope = {'headers': [(b'authorization', b'Bearer abc'), (b'cookie', b'access_token=def')]}
+    assert scope_token(scope, 'access_token') == 'abc'
+
+    scope = {'headers': [(b'authorization', b'Token abc'), (b'cookie', b'a=b; access_token=def')]}
+    assert scope_token(scope, 'access_token') == 'def'
+    assert scope_token(scope, 'refresh_token') is None
+    assert scope_token({'headers': []}, 'access_token') is None
+
+
+@pytest.mark.asyncio
+class TestAuthMiddleware:
+
+    @pytest_asyncio.fixture
+    async def client(self):
+        middleware = AuthenticationMiddleware(app, router=app.router)
+        async with AsyncClient(app=middleware, base_url="http://127.0.0.1:8000") as client:
+            client.middleware = middleware
+            yield client
+
+    @pytest.fixture(autouse=True)
+    async def set_up(self, async_session: AsyncSession):
+        user = User(username='testuser', name="test", email='test@test.com', is_active=True)
+        user.set_password('testpassword')
+        async_session.add(user)
+        await async_session.commit()
+
+    async def test_opted_in_routes(self, client: AsyncClient):
+        routes = {route.name: token_class for route, token_class in client.middleware.routes}
+        assert routes == {'verify': AccessToken}
+
+    async def test_bearer(self, client: AsyncClient):
+        client.headers.update({'authorization': f'Bearer {AccessToken.encode({"uid": 1})}'})
+
+        with mock.patch.object(login, 'auth_check_token', wraps=login.auth_check_token) as check:
+            response = await client.get(app.url_path_for('verify'))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == {'uid': 1}
+        assert check.call_count == 0
+
+    async def test_cookie(self, client: AsyncClient):
+        client.cookies.set('access_token', AccessToken.encode({'uid': 1}))
+        response = await client.get(app.url_path_for('verify'))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == {'uid': 1}
+
+    async def test_invalid_token(self, client: AsyncClient):
+        client.headers.update({'authorization': 'Bearer invalid'})
+        response = await client.get(app.url_path_for('verify'))
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+        assert "Invalid token" in response.text
+
+    async def test_refresh_token_rejected(self, client: AsyncClient):
+        client.headers.update({'authorization': f'Bearer {RefreshToken.encode({"uid": 1})}'})
+        response = await client.get(app.url_path_for('verify'))
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    async def test_unknown_user(self, client: AsyncClient):
+        client.headers.update({'authorization': f'Bearer {AccessToken.encode({"uid": 2})}'})
+        response = await client.get(app.url_path_for('verify'))
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+        assert "Wrong user credentials" in response.text
+
+    async def test_no_token(self, client: AsyncClient):
+        response = await client.get(app.url_path_for('verify'))
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+        assert "Invalid token" in response.text
+
+    async def test_other_routes_untouched(self, client: AsyncClient):
+        with mock.patch.object(AuthenticationMiddleware, 'authenticate') as authenticate:
+            response = await client.get(app.url_path_for('health'))
+            response = await client.post(app.url_path_for('logout'))
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+        assert authenticate.call_count == 0
@@ -0,0 +1,79 @@
+import pytest
+from fastapi import HTTPException
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette import status
+
+from app.auth import login
+from app.auth.ratelimit import LoginRateLimiter, MemoryRateLimitBackend
+from app.models.user import User
+from app.tests.conftest import app
+
+
+@pytest.mark.asyncio
+class TestMemoryRateLimitBackend:
+
+    async def test_bucket_burst(self):
+        backend = MemoryRateLimitBackend()
+
+        for _ in range(3):
+            assert await backend.hit('key', rate=1.0, burst=3) == 0
+
+        assert await backend.hit('key', rate=1.0, burst=3) > 0
+        assert await backend.hit('other', rate=1.0, burst=3) == 0
+
+    async def test_bucket_max_keys(self):
+        backend = MemoryRateLimitBackend(max_keys=10)
+
+        for i in range(100):
+            await backend.hit(f'key{i}', rate=1.0, burst=1)
+
+        assert len(backend) <= 10
+
+    async def test_bucket_ttl(self):
+        backend = MemoryRateLimitBackend(ttl=0)
+        await backend.hit('key', rate=1.0, burst=1)
+        await backend.hit('other', rate=1.0, burst=1)
+
+        assert len(backend) == 1
+
+    async def test_limiter_login_key_normalized(self):
+        limiter = LoginRateLimiter(MemoryRateLimitBackend(), ip_per_minute=60, ip_burst=10,
+                                   login_per_minute=1, login_burst=1)
+        await limiter.check('127.0.0.1', 'testuser')
+
+        with pytest.raises(HTTPException) as exc:
+            await limiter.check('127.0.0.2', ' TestUser')
+
+        assert exc.value.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        assert int(exc.value.headers['Retry-After']) > 0
+
+
+@pytest.mark.asyncio
+class TestLoginRateLimit:
+
+    @pytest.fixture(autouse=True)
+    async def set_up(self, async_session: AsyncSession, monkeypatch):
+        user = User(username='testuser', name="test", email='test@test.com')
+        user.set_password('testpassword')
+        async_session.add(user)
+        await async_session.commit()
+
+        monkeypatch.setattr(login, 'login_rate_limiter',
+                            LoginRateLimiter(MemoryRateLimitBackend(), ip_per_minute=60, ip_burst=10,
+                                             login_per_minute=1, login_burst=2))
+
+    async def test_login_rate_limited(self, async_client: AsyncClient):
+        for _ in range(2):
+            response = await async_client.post(app.url_path_for('login_token'),
+                                               json={'login': 'testuser', 'password': 'wrong'})
+            assert response.status_code == status.HTTP_403_FORBIDDEN
+
+        response = await async_client.post(app.url_path_for('login_token'),
+                                           json={'login': 'testuser', 'password': 'testpassword'})
+        assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        assert 'retry-after' in response.headers
+
+        response = await async_client.post(app.url_path_for('login_cookie'),
+                                           json={'login': 'testuser', 'password': 'testpassword'})
+        assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
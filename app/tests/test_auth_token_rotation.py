@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
+from starlette import status
+
+from app.auth.login import auth_revoke_refresh_token
+from app.auth.tokens import RefreshToken
+from app.models import UserRefreshToken
+from app.models.user import User
+from app.tests.conftest import app, response_json
+
+
+@pytest.mark.asyncio
+class TestTokenRotation:
+
+    @pytest.fixture(autouse=True)
+    async def set_up(self, async_session: AsyncSession):
+        user = User(username='testuser', name="test", email='test@test.com', is_active=True)
+        user.set_password('testpassword')
+        async_session.add(user)
+        await async_session.commit()
+
+    async def login(self, async_client: AsyncClient) -> str:
+        response = await async_client.post(app.url_path_for('login_token'),
+                                           json={'login': 'testuser', 'password': 'testpassword'})
+        assert response.status_code == status.HTTP_200_OK
+        return response_json(response)['refresh_token']
+
+    async def test_revoke_states(self, async_client: AsyncClient, async_session: AsyncSession):
+        claims = RefreshToken.decode(await self.login(async_client))
+
+        assert await auth_revoke_refresh_token(claims, async_session) is True
+        await async_session.commit()
+        assert await auth_revoke_refresh_token(claims, async_session) is False
+        assert await auth_revoke_refresh_token({'jti': 'unknown'}, async_session) is None
+
+    async def test_rotation_single_transaction(self, async_client: AsyncClient, async_session: AsyncSession):
+        refresh_token = await self.login(async_client)
+
+        async_client.headers.update({'authorization': f'Bearer {refresh_token}'})
+        response = await async_client.post(app.url_path_for('dual_token_refresh'))
+        assert response.status_code == status.HTTP_200_OK
+
+        rows = (await async_session.execute(select(UserRefreshToken).order_by(UserRefreshToken.id))).scalars().all()
+        assert [row.blacklisted for row in rows] == [True, False]
+        assert rows[1].jti == RefreshToken.decode(response_json(response)['refresh_token'])['jti']
+
+    async def test_concurrent_rotation(self, async_client: AsyncClient, async_session: AsyncSession):
+        refresh_token = await self.login(async_client)
+
+        async_client.headers.update({'authorization': f'Bearer {refresh_token}'})
+        responses = await asyncio.gather(*[async_client.post(app.url_path_for('dual_token_refresh'))
+                                           for _ in range(2)])
+
+        assert sorted(response.status_code for response in responses) == [status.HTTP_200_OK,
+                                                                           status.HTTP_403_FORBIDDEN]
+
+        rows = (await async_session.execute(select(UserRefreshToken))).scalars().all()
+        assert len(rows) == 2
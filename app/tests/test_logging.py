@@ -0,0 +1,97 @@
+import json
+import logging
+import queue
+import sys
+from unittest import TestCase
+
+from app.log import DeferredQueueHandler, JSONFormatter, SamplingFilter, configure_logging
+
+
+def make_record(msg, *args, level=logging.INFO, name='app.test', lineno=1, **extra):
+    record = logging.LogRecord(name, level, __file__, lineno, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+class JSONFormatterTests(TestCase):
+    def test_message(self):
+        line = json.loads(JSONFormatter().format(make_record('user %d logged in', 1, request_id='abc')))
+
+        self.assertEqual(line['message'], 'user 1 logged in')
+        self.assertEqual(line['level'], 'INFO')
+        self.assertEqual(line['logger'], 'app.test')
+        self.assertEqual(line['request_id'], 'abc')
+        self.assertIn('time', line)
+        self.assertNotIn('args', line)
+
+    def test_dict_message(self):
+        line = json.loads(JSONFormatter().format(make_record({'path': '/auth/login', 'status': 200})))
+
+        self.assertEqual(line['path'], '/auth/login')
+        self.assertEqual(line['status'], 200)
+        self.assertNotIn('message', line)
+
+    def test_exception(self):
+        try:
+            raise ValueError('boom')
+        except ValueError:
+            record = logging.LogRecord('app.test', logging.ERROR, __file__, 1, 'failed', (), sys.exc_info())
+
+        line = json.loads(JSONFormatter().format(record))
+        self.assertIn('ValueError: boom', line['exc_info'])
+
+
+class SamplingFilterTests(TestCase):
+    def test_debug_sampled(self):
+        sampling = SamplingFilter(every=10)
+        kept = [sampling.filter(make_record('opening database session', level=logging.DEBUG)) for _ in range(100)]
+
+        self.assertEqual(sum(kept), 10)
+
+    def test_sampled_per_call_site(self):
+        sampling = SamplingFilter(every=10)
+
+        self.assertTrue(sampling.filter(make_record('first', level=logging.DEBUG, lineno=1)))
+        self.assertTrue(sampling.filter(make_record('second', level=logging.DEBUG, lineno=2)))
+        self.assertFalse(sampling.filter(make_record('first', level=logging.DEBUG, lineno=1)))
+
+    def test_dict_message_logged(self):
+        log_queue = queue.SimpleQueue()
+        handler = DeferredQueueHandler(log_queue)
+        handler.addFilter(SamplingFilter(every=10))
+        logger = logging.getLogger('app.test.sampling')
+        logger.addHandler(handler)
+        logger.setLevel(logging.DEBUG)
+        logger.propagate = False
+        try:
+            for _ in range(20):
+                logger.debug({'path': '/auth/verify', 'status': 200})
+        finally:
+            logger.removeHandler(handler)
+
+        self.assertEqual(log_queue.qsize(), 2)
+
+    def test_other_levels_kept(self):
+        sampling = SamplingFilter(every=10)
+
+        self.assertTrue(all(sampling.filter(make_record('login failed', level=logging.WARNING)) for _ in range(20)))
+
+
+class QueueHandlerTests(TestCase):
+    def test_not_formatted_on_caller(self):
+        log_queue = queue.SimpleQueue()
+        handler = DeferredQueueHandler(log_queue)
+        record = make_record('user %d logged in', 1)
+
+        handler.handle(record)
+        queued = log_queue.get_nowait()
+
+        self.assertEqual(queued.msg, 'user %d logged in')
+        self.assertEqual(queued.args, (1,))
+        self.assertEqual(queued.getMessage(), 'user 1 logged in')
+
+    def test_configured_once(self):
+        self.assertIs(configure_logging(), configure_logging())
+
+        handlers = [h for h in logging.getLogger().handlers if isinstance(h, DeferredQueueHandler)]
+        self.assertEqual(len(handlers), 1)
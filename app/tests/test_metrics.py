@@ -0,0 +1,152 @@
+from unittest import TestCase, mock
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette import status
+
+from app.auth import login
+from app.auth.admission import ConcurrencyLimiter
+from app.auth.ratelimit import LoginRateLimiter, MemoryRateLimitBackend
+from app.auth.tokens import AccessToken
+from app.config import settings
+from app.metrics import Registry
+from app.models.user import User
+from app.tests.conftest import app
+
+
+def sample(text: str, line: str) -> float:
+    for row in text.splitlines():
+        if row.startswith(line + ' '):
+            return float(row.rsplit(' ', 1)[1])
+    return 0
+
+
+class RegistryTests(TestCase):
+    def test_counter(self):
+        registry = Registry()
+        counter = registry.counter('requests_total', 'Requests', ['route'])
+        counter.labels('login').inc()
+        counter.labels(route='login').inc(2)
+        counter.labels('logout').inc()
+
+        text = registry.exposition()
+        self.assertIn('# TYPE requests_total counter', text)
+        self.assertIn('requests_total{route="login"} 3', text)
+        self.assertIn('requests_total{route="logout"} 1', text)
+
+    def test_histogram(self):
+        registry = Registry()
+        histogram = registry.histogram('latency_seconds', 'Latency', buckets=(.1, 1))
+        histogram.observe(.05)
+        histogram.observe(.1)
+        histogram.observe(.5)
+        histogram.observe(5)
+
+        text = registry.exposition()
+        self.assertIn('# TYPE latency_seconds histogram', text)
+        self.assertIn('latency_seconds_bucket{le="0.1"} 2', text)
+        self.assertIn('latency_seconds_bucket{le="1"} 3', text)
+        self.assertIn('latency_seconds_bucket{le="+Inf"} 4', text)
+        self.assertIn('latency_seconds_count 4', text)
+        self.assertIn('latency_seconds_sum 5.65', text)
+
+    def test_gauge_function(self):
+        registry = Registry()
+        values = [1]
+        registry.gauge('queue_size', 'Queue size').set_function(lambda: len(values))
+        values.append(2)
+
+        self.assertIn('queue_size 2', registry.exposition())
+
+    def test_label_escaping(self):
+        registry = Registry()
+        registry.counter('escaped_total', 'Escaped', ['value']).labels('a"b\\c\nd').inc()
+
+        self.assertIn('escaped_total{value="a\\"b\\\\c\\nd"} 1', registry.exposition())
+
+    def test_duplicate(self):
+        registry = Registry()
+        registry.counter('requests_total', 'Requests')
+
+        with self.assertRaises(ValueError):
+            registry.counter('requests_total', 'Requests')
+
+    def test_wrong_labels(self):
+        registry = Registry()
+        counter = registry.counter('requests_total', 'Requests', ['route', 'method'])
+
+        with self.assertRaises(ValueError):
+            counter.labels('login')
+
+
+@pytest.mark.asyncio
+class TestMetricsEndpoint:
+
+    @pytest.fixture(autouse=True)
+    async def set_up(self, async_session: AsyncSession):
+        user = User(username='testuser', name="test", email='test@test.com', is_active=True)
+        user.set_password('testpassword')
+        async_session.add(user)
+        await async_session.commit()
+
+    async def test_metrics(self, async_client: AsyncClient):
+        before = (await async_client.get('/metrics')).text
+
+        response = await async_client.post(app.url_path_for('login_token'),
+                                           json={'login': 'testuser', 'password': 'testpassword'})
+        assert response.status_code == status.HTTP_200_OK
+        response = await async_client.post(app.url_path_for('login_token'), json={})
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+        async_client.headers.update({'authorization': f'Bearer {AccessToken.encode({"uid": 1})}'})
+        for _ in range(2):
+            response = await async_client.get(app.url_path_for('verify'))
+            assert response.status_code == status.HTTP_200_OK
+
+        response = await async_client.get('/metrics')
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers['content-type'].startswith('text/plain; version=0.0.4')
+        after = response.text
+
+        def delta(line):
+            return sample(after, line) - sample(before, line)
+
+        assert delta('http_request_duration_seconds_count{route="login_token",method="POST",status="200"}') == 1
+        assert delta('http_request_duration_seconds_count{route="login_token",method="POST",status="422"}') == 1
+        assert delta('http_request_duration_seconds_count{route="verify",method="GET",status="200"}') == 2
+        assert delta('auth_password_verify_seconds_count') == 1
+        assert delta('auth_jwt_encode_seconds_count') >= 2
+        assert delta('auth_jwt_decode_seconds_count') >= 1
+        assert delta('auth_cache_hits_total{cache="principal"}') >= 1
+        assert delta('db_query_duration_seconds_count{engine="async"}') >= 2
+        assert 'auth_cache_hit_ratio{cache="token"}' in after
+        assert 'db_pool_checkout_seconds_count' in after
+
+    async def test_login_admission_metrics(self, async_client: AsyncClient, monkeypatch):
+        monkeypatch.setattr(login, 'login_limiter', ConcurrencyLimiter(1, 0, 1.0))
+        monkeypatch.setattr(login, 'login_rate_limiter',
+                            LoginRateLimiter(MemoryRateLimitBackend(), ip_per_minute=60, ip_burst=10,
+                                             login_per_minute=1, login_burst=1))
+
+        await login.login_limiter.acquire()
+        response = await async_client.post(app.url_path_for('login_token'),
+                                           json={'login': 'testuser', 'password': 'testpassword'})
+        assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        response = await async_client.post(app.url_path_for('login_token'),
+                                           json={'login': 'testuser', 'password': 'testpassword'})
+        assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+
+        text = (await async_client.get('/metrics')).text
+        login.login_limiter.release()
+
+        assert sample(text, 'auth_login_pending{state="in_flight"}') == 1
+        assert sample(text, 'auth_login_pending{state="queued"}') == 0
+        assert sample(text, 'auth_login_rejected_total{reason="overloaded"}') == 1
+        assert sample(text, 'auth_login_rejected_total{reason="rate_limited"}') == 1
+
+    async def test_metrics_disabled(self, async_client: AsyncClient):
+        with mock.patch.object(settings, 'METRICS_ENABLED', False):
+            response = await async_client.get('/metrics')
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
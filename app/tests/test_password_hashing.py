@@ -0,0 +1,78 @@
+import asyncio
+import time
+
+import pytest
+
+from app.auth import PASSWORD_CONTEXT, HashingExecutor, get_hashed_password, verify_password, verify_password_async, \
+    hashing_executor
+from app.models.user import User
+
+
+@pytest.mark.asyncio
+class TestPasswordHashing:
+
+    async def test_verify_password_async(self):
+        hashed = get_hashed_password('testpassword')
+
+        assert await verify_password_async('testpassword', hashed) is True
+        assert await verify_password_async('wrongpassword', hashed) is False
+
+    async def test_user_password_async(self):
+        user = User(username='testuser', name="test", email='test@test.com')
+        await user.set_password_async('testpassword')
+
+        assert user.check_password('testpassword') is True
+        assert await user.check_password_async('testpassword') is True
+
+    async def test_bcrypt_backend(self):
+        # os_crypt holds the GIL for the whole hash, worker threads would still block the event loop
+        assert PASSWORD_CONTEXT.handler('bcrypt').get_backend() == 'bcrypt'
+
+    async def test_event_loop_not_blocked(self):
+        executor = HashingExecutor(2)
+        hashed = get_hashed_password('testpassword')
+        running = True
+        max_lag = 0.0
+
+        async def ticker():
+            nonlocal max_lag
+            while running:
+                started = time.perf_counter()
+                await asyncio.sleep(0.001)
+                max_lag = max(max_lag, time.perf_counter() - started - 0.001)
+
+        task = asyncio.create_task(ticker())
+        started = time.perf_counter()
+        await asyncio.gather(*[executor.run(verify_password, 'testpassword', hashed) for _ in range(2)])
+        elapsed = time.perf_counter() - started
+        running = False
+        await task
+        executor.shutdown()
+
+        assert max_lag < elapsed / 4, f'event loop stalled {max_lag * 1000:.0f}ms while hashing took {elapsed * 1000:.0f}ms'
+
+    async def test_executor_stats(self):
+        hashed = get_hashed_password('testpassword')
+        completed = hashing_executor.completed
+
+        await asyncio.gather(*[verify_password_async('testpassword', hashed) for _ in range(3)])
+
+        stats = hashing_executor.stats()
+        assert stats['in_flight'] == 0
+        assert stats['queued'] == 0
+        assert stats['completed'] == completed + 3
+
+    async def test_executor_queue_depth(self):
+        executor = HashingExecutor(1)
+        hashed = get_hashed_password('testpassword')
+
+        tasks = [asyncio.create_task(executor.run(verify_password, 'testpassword', hashed)) for _ in range(3)]
+        await asyncio.sleep(0)
+
+        stats = executor.stats()
+        assert stats['in_flight'] == 1
+        assert stats['queued'] == 2
+
+        assert all(await asyncio.gather(*tasks))
+        assert executor.stats()['max_pending'] == 3
+        executor.shutdown()
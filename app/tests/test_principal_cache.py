@@ -0,0 +1,144 @@
+import time
+from unittest import TestCase, mock
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
+from starlette import status
+
+from app.auth.cache import TTLCache
+from app.auth.login import auth_verify_token
+from app.auth.principal import Principal, principal_cache
+from app.auth.tokens import AccessToken
+from app.database import get_async_session
+from app.models.user import User
+from app.tests.conftest import app
+
+
+class TTLCacheTests(TestCase):
+    def test_cache_hit_miss(self):
+        cache = TTLCache(maxsize=10, ttl=60)
+        cache.set('key', 'value')
+
+        self.assertEqual(cache.get('key'), 'value')
+        self.assertIsNone(cache.get('other'))
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 1)
+
+    def test_cache_maxsize(self):
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set(1, 1)
+        cache.set(2, 2)
+        cache.get(1)
+        cache.set(3, 3)
+
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get(2))
+        self.assertEqual(cache.get(1), 1)
+
+    def test_cache_expired(self):
+        cache = TTLCache(maxsize=10, ttl=60)
+        cache.set('key', 'value', ttl=1)
+
+        with mock.patch('app.auth.cache.time.monotonic', return_value=time.monotonic() + 2):
+            self.assertIsNone(cache.get('key'))
+
+        self.assertEqual(len(cache), 0)
+
+    def test_cache_invalidate(self):
+        cache = TTLCache(maxsize=10, ttl=60)
+        cache.set('key', 'value')
+        cache.invalidate('key')
+
+        self.assertIsNone(cache.get('key'))
+
+    def test_cache_disabled(self):
+        cache = TTLCache(maxsize=0, ttl=60)
+        cache.set('key', 'value')
+
+        self.assertIsNone(cache.get('key'))
+
+
+@pytest.mark.asyncio
+class TestPrincipalCache:
+
+    @pytest.fixture(autouse=True)
+    async def set_up(self, async_session: AsyncSession, async_client: AsyncClient):
+        user = User(username='testuser', name="test", email='test@test.com', is_active=True)
+        user.set_password('testpassword')
+        async_session.add(user)
+        await async_session.commit()
+
+        async_client.headers.update({
+            'authorization': f'Bearer {AccessToken.encode({"uid": 1})}'
+        })
+
+    async def test_verify_cached(self, async_client: AsyncClient):
+        response = await async_client.get(app.url_path_for('verify'))
+        assert response.status_code == status.HTTP_200_OK
+
+        hits = principal_cache.hits
+        response = await async_client.get(app.url_path_for('verify'))
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()['uid'] == 1
+        assert principal_cache.hits == hits + 1
+
+        assert 'password' not in principal_cache.get(1)
+
+    async def test_verify_uses_request_session(self, async_client: AsyncClient, async_session: AsyncSession):
+        sessions = []
+
+        async def override_session():
+            sessions.append(async_session)
+            yield async_session
+
+        app.dependency_overrides[get_async_session] = override_session
+        try:
+            response = await async_client.get(app.url_path_for('verify'))
+        finally:
+            del app.dependency_overrides[get_async_session]
+
+        assert response.status_code == status.HTTP_200_OK
+        assert sessions == [async_session]
+
+    async def test_cache_invalidated_on_update(self, async_client: AsyncClient, async_session: AsyncSession):
+        response = await async_client.get(app.url_path_for('verify'))
+        assert response.status_code == status.HTTP_200_OK
+        assert principal_cache.get(1) is not None
+
+        user = (await async_session.execute(select(User))).scalars().first()
+        user.is_active = False
+        async_session.add(user)
+        await async_session.commit()
+
+        assert principal_cache.get(1) is None
+        response = await async_client.get(app.url_path_for('verify'))
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+        assert response.json()['detail'] == "User is not active"
+
+    async def test_cache_invalidated_on_delete(self, async_client: AsyncClient, async_session: AsyncSession):
+        response = await async_client.get(app.url_path_for('verify'))
+        assert response.status_code == status.HTTP_200_OK
+
+        user = (await async_session.execute(select(User))).scalars().first()
+        await async_session.delete(user)
+        await async_session.commit()
+
+        response = await async_client.get(app.url_path_for('verify'))
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    async def test_principal_projection(self, async_session: AsyncSession):
+        token = AccessToken.encode({'uid': 1})
+        user = await auth_verify_token(token, async_session)
+
+        assert isinstance(user, Principal)
+        assert user.id == 1
+        assert user.token == token
+        assert user.token_claims['uid'] == 1
+        assert not hasattr(user, 'password')
+        assert not hasattr(user, '__dict__')
+        with pytest.raises(AttributeError):
+            user.id = 2
+
+        assert await auth_verify_token(token, async_session) == user
@@ -0,0 +1,134 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette import status
+
+from app.auth.tokens import AccessToken
+from app.config import settings
+from app.database import count_queries, engine_kwargs, redact_parameters
+from app.models.user import User
+from app.tests.conftest import app, response_json
+
+
+def test_redact_parameters():
+    assert redact_parameters(('secret', 1)) == ['str', 'int']
+    assert redact_parameters({'token_digest': b'x', 'user': 1}) == {'token_digest': 'bytes', 'user': 'int'}
+    assert redact_parameters([('a',), ('b',), ('c',), ('d',)]) == [['str'], ['str'], ['str'], '...']
+
+
+def test_sync_sqlite_pool_across_threads(tmp_path):
+    url = f'sqlite:///{tmp_path / "sync.db"}'
+    engine = create_engine(url, **engine_kwargs(url, is_async=False))
+
+    def query():
+        with engine.connect() as conn:
+            return conn.execute(text('SELECT 1')).scalar()
+
+    # the pooled connection is opened on one thread and reused on the other
+    with ThreadPoolExecutor(1) as first, ThreadPoolExecutor(1) as second:
+        assert first.submit(query).result() == 1
+        assert second.submit(query).result() == 1
+    assert engine.pool.checkedin() == 1
+    engine.dispose()
+
+
+@pytest.mark.asyncio
+class TestQueryCounts:
+    """Upper bounds on statements per endpoint, a redundant select or an N+1 in app/auth/login.py fails here."""
+
+    @pytest.fixture(autouse=True)
+    async def set_up(self, async_session: AsyncSession):
+        for i in range(1, 4):
+            user = User(username=f'testuser{i}', name="test", email=f'test{i}@test.com', is_active=True)
+            user.set_password('testpassword')
+            async_session.add(user)
+        await async_session.commit()
+
+    async def login(self, async_client: AsyncClient) -> dict:
+        response = await async_client.post(app.url_path_for('login_token'),
+                                           json={'login': 'testuser1', 'password': 'testpassword'})
+        assert response.status_code == status.HTTP_200_OK
+        return response_json(response)
+
+    async def test_login_token(self, async_client: AsyncClient, max_queries):
+        # user lookup, refresh token insert
+        with max_queries(2):
+            await self.login(async_client)
+
+    async def test_login_cookie(self, async_client: AsyncClient, max_queries):
+        with max_queries(2):
+            response = await async_client.post(app.url_path_for('login_cookie'),
+                                               json={'login': 'testuser1', 'password': 'testpassword'})
+        assert response.status_code == status.HTTP_200_OK
+
+    async def test_login_wrong_password(self, async_client: AsyncClient, max_queries):
+        with max_queries(1):
+            response = await async_client.post(app.url_path_for('login_token'),
+                                               json={'login': 'testuser1', 'password': 'wrong'})
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    async def test_verify(self, async_client: AsyncClient, max_queries):
+        async_client.headers.update({'authorization': f'Bearer {AccessToken.encode({"uid": 1})}'})
+
+        with max_queries(1):
+            response = await async_client.get(app.url_path_for('verify'))
+        assert response.status_code == status.HTTP_200_OK
+
+        # principal cache hit
+        with max_queries(0):
+            response = await async_client.get(app.url_path_for('verify'))
+        assert response.status_code == status.HTTP_200_OK
+
+    async def test_verify_batch(self, async_client: AsyncClient, max_queries):
+        tokens = [AccessToken.encode({'uid': uid}) for uid in (1, 2, 3, 4) for _ in range(5)]
+
+        # one select for all users, however many tokens
+        with max_queries(1):
+            response = await async_client.post(app.url_path_for('verify_batch'), json={'tokens': tokens})
+        assert response.status_code == status.HTTP_200_OK
+
+    async def test_refresh(self, async_client: AsyncClient, max_queries):
+        tokens = await self.login(async_client)
+        async_client.headers.update({'authorization': f'Bearer {tokens["refresh_token"]}'})
+
+        # principal, conditional update, the revocation list answers the blacklist check
+        with max_queries(2):
+            response = await async_client.post(app.url_path_for('token_refresh'))
+        assert response.status_code == status.HTTP_200_OK
+
+    async def test_refresh_pair(self, async_client: AsyncClient, max_queries):
+        tokens = await self.login(async_client)
+        async_client.headers.update({'authorization': f'Bearer {tokens["refresh_token"]}'})
+
+        # principal, conditional update, successor insert
+        with max_queries(3):
+            response = await async_client.post(app.url_path_for('dual_token_refresh'))
+        assert response.status_code == status.HTTP_200_OK
+
+    async def test_logout(self, async_client: AsyncClient, max_queries):
+        tokens = await self.login(async_client)
+        async_client.headers.update({'authorization': f'Bearer {tokens["refresh_token"]}'})
+
+        # principal, conditional update
+        with max_queries(2):
+            response = await async_client.post(app.url_path_for('logout'))
+        assert response.status_code == status.HTTP_200_OK
+
+
+@pytest.mark.asyncio
+async def test_slow_query_logged(async_session: AsyncSession, caplog):
+    with mock.patch.object(settings, 'DATABASE_SLOW_QUERY_THRESHOLD', 1e-9), \
+            caplog.at_level(logging.WARNING, logger='app.database'):
+        with count_queries() as counter:
+            await async_session.execute(text('SELECT :secret'), {'secret': 'hunter2'})
+
+    assert counter.count == 1
+    record = caplog.records[-1].msg
+    assert record['message'] == 'slow query'
+    assert record['parameters'] == ['str']
+    assert 'hunter2' not in caplog.text
@@ -0,0 +1,111 @@
+import time
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
+from starlette import status
+
+from app.auth.revocation import revocation_list
+from app.auth.tokens import RefreshToken
+from app.config import settings
+from app.models import UserRefreshToken, refresh_token_queue
+from app.models.user import User
+from app.tests.conftest import app, response_json
+
+
+@pytest.mark.asyncio
+class TestRefreshTokenQueue:
+
+    @pytest.fixture(autouse=True)
+    async def set_up(self, async_session: AsyncSession, monkeypatch):
+        user = User(username='testuser', name="test", email='test@test.com', is_active=True)
+        user.set_password('testpassword')
+        async_session.add(user)
+        await async_session.commit()
+
+        monkeypatch.setattr(settings, 'REFRESH_TOKEN_WRITE_BEHIND', True)
+        yield
+        await refresh_token_queue.drain()
+
+    async def login(self, async_client: AsyncClient) -> str:
+        response = await async_client.post(app.url_path_for('login_token'),
+                                           json={'login': 'testuser', 'password': 'testpassword'})
+        assert response.status_code == status.HTTP_200_OK
+        return response_json(response)['refresh_token']
+
+    async def rows(self, async_session: AsyncSession):
+        return (await async_session.execute(select(UserRefreshToken))).scalars().all()
+
+    async def test_login_queued(self, async_client: AsyncClient, async_session: AsyncSession):
+        refresh_token = await self.login(async_client)
+
+        assert len(refresh_token_queue) == 1
+        assert await self.rows(async_session) == []
+
+        assert await refresh_token_queue.flush() == 1
+        rows = await self.rows(async_session)
+        assert len(rows) == 1
+        assert rows[0].jti == RefreshToken.decode(refresh_token)['jti']
+        assert rows[0].blacklisted is False
+        assert rows[0].ip_address == '127.0.0.1'
+
+    async def test_logout_before_flush(self, async_client: AsyncClient, async_session: AsyncSession):
+        refresh_token = await self.login(async_client)
+
+        async_client.headers.update({'authorization': f'Bearer {refresh_token}'})
+        response = await async_client.post(app.url_path_for('logout'))
+        assert response.status_code == status.HTTP_200_OK
+
+        response = await async_client.post(app.url_path_for('token_refresh'))
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+        await refresh_token_queue.flush()
+        rows = await self.rows(async_session)
+        assert rows[0].blacklisted is True
+        assert rows[0].blacklisted_at is not None
+
+    async def test_revoked_by_other_worker(self, async_client: AsyncClient, async_session: AsyncSession):
+        refresh_token = await self.login(async_client)
+        revocation_list.add(RefreshToken.decode(refresh_token)['jti'], time.time() + 60)
+
+        await refresh_token_queue.flush()
+        rows = await self.rows(async_session)
+        assert rows[0].blacklisted is True
+
+    async def test_queue_full(self, async_client: AsyncClient, async_session: AsyncSession, monkeypatch):
+        monkeypatch.setattr(refresh_token_queue, 'maxsize', 0)
+        await self.login(async_client)
+
+        assert len(refresh_token_queue) == 0
+        assert len(await self.rows(async_session)) == 1
+
+    async def test_flush_batches(self, async_client: AsyncClient, async_session: AsyncSession, monkeypatch):
+        monkeypatch.setattr(refresh_token_queue, 'batch_size', 2)
+        for _ in range(3):
+            await self.login(async_client)
+
+        assert await refresh_token_queue.flush() == 2
+        await refresh_token_queue.drain()
+        assert len(await self.rows(async_session)) == 3
+
+    async def test_bad_row_dropped(self, async_client: AsyncClient, async_session: AsyncSession):
+        await self.login(async_client)
+        duplicate = dict(next(iter(refresh_token_queue._pending.values())))
+        await refresh_token_queue.flush()
+        dropped = refresh_token_queue.dropped
+
+        # same jti as the stored row, fails the unique index
+        refresh_token_queue.put(duplicate)
+        await self.login(async_client)
+
+        assert await refresh_token_queue.flush() == 2
+        assert len(refresh_token_queue) == 0
+        assert refresh_token_queue.dropped == dropped + 1
+        assert len(await self.rows(async_session)) == 2
+
+    async def test_memory_revocation_store_refused(self, monkeypatch):
+        monkeypatch.setattr(settings, 'REVOCATION_STORE', 'memory')
+
+        with pytest.raises(RuntimeError):
+            await refresh_token_queue.start()
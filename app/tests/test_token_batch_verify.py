@@ -0,0 +1,69 @@
+from unittest import mock
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette import status
+
+from app.auth.principal import principal_cache
+from app.auth.tokens import AccessToken, RefreshToken
+from app.config import settings
+from app.models.user import User
+from app.tests.conftest import app, response_json
+
+
+@pytest.mark.asyncio
+class TestTokenBatchVerify:
+
+    @pytest.fixture(autouse=True)
+    async def set_up(self, async_session: AsyncSession):
+        for i in range(3):
+            user = User(username=f'testuser{i}', name="test", email=f'test{i}@test.com', is_active=i < 2)
+            user.set_password('testpassword')
+            async_session.add(user)
+        await async_session.commit()
+
+    async def test_batch_verify(self, async_client: AsyncClient):
+        tokens = [
+            AccessToken.encode({'uid': 1}),
+            AccessToken.encode({'uid': 2}),
+            'wrongtoken',
+            RefreshToken.encode({'uid': 3}),
+            AccessToken.encode({'uid': 99}),
+            AccessToken.encode({'uid': 1}),
+            AccessToken.encode({'uid': 3}),
+        ]
+        response = await async_client.post(app.url_path_for('verify_batch'), json={'tokens': tokens})
+        assert response.status_code == status.HTTP_200_OK
+
+        assert response_json(response)['results'] == [
+            {'valid': True, 'uid': 1},
+            {'valid': True, 'uid': 2},
+            {'valid': False, 'detail': 'Invalid token'},
+            {'valid': False, 'detail': 'Invalid token'},
+            {'valid': False, 'detail': 'Wrong user credentials'},
+            {'valid': True, 'uid': 1},
+            {'valid': False, 'detail': 'User is not active'},
+        ]
+
+    async def test_batch_verify_cached(self, async_client: AsyncClient):
+        tokens = [AccessToken.encode({'uid': 1}), AccessToken.encode({'uid': 2})]
+        await async_client.post(app.url_path_for('verify_batch'), json={'tokens': tokens})
+        assert principal_cache.get(1) is not None
+        assert principal_cache.get(2) is not None
+
+        hits = principal_cache.hits
+        response = await async_client.post(app.url_path_for('verify_batch'), json={'tokens': tokens})
+        assert response.status_code == status.HTTP_200_OK
+        assert principal_cache.hits == hits + 2
+
+    async def test_batch_verify_empty(self, async_client: AsyncClient):
+        response = await async_client.post(app.url_path_for('verify_batch'), json={'tokens': []})
+        assert response.status_code == status.HTTP_200_OK
+        assert response_json(response)['results'] == []
+
+    async def test_batch_verify_too_many(self, async_client: AsyncClient):
+        with mock.patch.object(settings, 'VERIFY_BATCH_MAX_TOKENS', 1):
+            response = await async_client.post(app.url_path_for('verify_batch'),
+                                               json={'tokens': ['a', 'b']})
+        assert response.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
@@ -0,0 +1,152 @@
+import time
+from unittest import TestCase
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette import status
+
+from app.auth.login import auth_load_revocations
+from app.auth.revocation import RevocationList, MappedRevocationList, revocation_list
+from app.models.user import User
+from app.tests.conftest import app, response_json
+
+
+class RevocationListTests(TestCase):
+    def test_not_loaded(self):
+        revocations = RevocationList()
+        self.assertIsNone(revocations.is_revoked('jti'))
+
+    def test_revoked(self):
+        revocations = RevocationList()
+        revocations.load([('old', time.time() + 60)])
+        revocations.add('jti', time.time() + 60)
+
+        self.assertTrue(revocations.is_revoked('old'))
+        self.assertTrue(revocations.is_revoked('jti'))
+        self.assertFalse(revocations.is_revoked('other'))
+
+    def test_expired_pruned(self):
+        revocations = RevocationList()
+        revocations.load([('jti', time.time() + 60), ('expired', time.time() - 1)])
+
+        self.assertEqual(len(revocations), 1)
+        self.assertEqual(revocations.prune(time.time() + 61), 1)
+        self.assertFalse(revocations.is_revoked('jti'))
+
+
+@pytest.mark.asyncio
+class TestRefreshTokenRevocation:
+
+    @pytest.fixture(autouse=True)
+    async def set_up(self, async_session: AsyncSession):
+        user = User(username='testuser', name="test", email='test@test.com', is_active=True)
+        user.set_password('testpassword')
+        async_session.add(user)
+        await async_session.commit()
+
+    async def logout(self, async_client: AsyncClient) -> str:
+        response = await async_client.post(app.url_path_for('login_token'),
+                                           json={'login': 'testuser', 'password': 'testpassword'})
+        refresh_token = response_json(response)['refresh_token']
+
+        async_client.headers.update({'authorization': f'Bearer {refresh_token}'})
+        response = await async_client.post(app.url_path_for('logout'))
+        assert response.status_code == status.HTTP_200_OK
+
+        return refresh_token
+
+    async def test_revoked_token_rejected(self, async_client: AsyncClient):
+        await self.logout(async_client)
+        assert len(revocation_list) == 1
+
+        response = await async_client.post(app.url_path_for('token_refresh'))
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    async def test_revoked_token_rejected_database(self, async_client: AsyncClient):
+        await self.logout(async_client)
+        revocation_list.clear()
+
+        response = await async_client.post(app.url_path_for('token_refresh'))
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    async def test_revocations_loaded(self, async_client: AsyncClient):
+        await self.logout(async_client)
+        revocation_list.clear()
+
+        await auth_load_revocations()
+        assert revocation_list.loaded
+        assert len(revocation_list) == 1
+
+        response = await async_client.post(app.url_path_for('token_refresh'))
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+@pytest.fixture
+def mapped_path(tmp_path):
+    return str(tmp_path / 'revocations.bin')
+
+
+class TestMappedRevocationList:
+
+    def test_not_loaded(self, mapped_path):
+        revocations = MappedRevocationList(mapped_path, slots=16)
+        assert revocations.is_revoked('jti') is None
+
+    def test_shared_between_workers(self, mapped_path):
+        worker = MappedRevocationList(mapped_path, slots=16)
+        other = MappedRevocationList(mapped_path, slots=1024)
+        worker.load([('old', time.time() + 60)])
+
+        other.add('jti', time.time() + 60)
+
+        assert other.slots == 16
+        assert worker.is_revoked('jti') is True
+        assert worker.is_revoked('old') is True
+        assert other.is_revoked('old') is True
+        assert worker.is_revoked('other') is False
+
+    def test_expired_slots(self, mapped_path):
+        revocations = MappedRevocationList(mapped_path, slots=16)
+        revocations.load([])
+        revocations.add('jti', time.time() + 60)
+        revocations.add('short', time.time() + 1)
+
+        assert revocations.prune(time.time() + 2) == 1
+        assert revocations.is_revoked('short') is False
+        assert revocations.is_revoked('jti') is True
+        assert len(revocations) == 1
+
+    def test_compaction_on_insert(self, mapped_path):
+        revocations = MappedRevocationList(mapped_path, slots=16)
+        revocations.load([])
+
+        now = time.time()
+        for i in range(12):
+            revocations._add(revocations._digest(f'short{i}'), now + 1, now)
+
+        # table is at its load limit, the next insert compacts the expired slots away
+        for i in range(10):
+            revocations._add(revocations._digest(f'jti{i}'), now + 60, now + 2)
+
+        assert len(revocations) == 10
+        assert revocations.is_revoked('jti9') is True
+        assert revocations.is_revoked('short0') is False
+
+    def test_overflow(self, mapped_path):
+        revocations = MappedRevocationList(mapped_path, slots=4)
+        revocations.load([(f'jti{i}', time.time() + 60) for i in range(5)])
+
+        assert revocations.is_revoked('jti0') is None
+
+        revocations.clear()
+        assert revocations.is_revoked('jti0') is None
+        revocations.load([])
+        assert revocations.is_revoked('jti0') is False
+
+    def test_invalid_file(self, mapped_path):
+        with open(mapped_path, 'wb') as f:
+            f.write(bytes(128))
+
+        with pytest.raises(ValueError):
+            MappedRevocationList(mapped_path, slots=16)
@@ -1,11 +1,12 @@
 import datetime
+import time
 import uuid
 from unittest import TestCase
 from unittest import mock
 
 import jwt
 
-from app.auth.tokens import Token, AccessToken, RefreshToken
+from app.auth.tokens import Token, AccessToken, RefreshToken, token_cache
 from app.config import settings
 
 
@@ -134,3 +135,35 @@ class TokenSecurityTests(TestCase):
 
         with self.assertRaises(jwt.exceptions.InvalidIssuerError):
             Token.decode_token(token, issuer='test')
+
+    def test_jwt_decode_cached(self):
+        token = AccessToken.encode({'uid': 1})
+        decoded = AccessToken.decode(token)
+        hits = token_cache.hits
+
+        self.assertEqual(AccessToken.decode(token), decoded)
+        self.assertEqual(token_cache.hits, hits + 1)
+
+    def test_jwt_decode_cached_invalid_issuer(self):
+        token = AccessToken.encode({'uid': 1})
+        AccessToken.decode(token)
+
+        with self.assertRaises(jwt.exceptions.InvalidIssuerError):
+            RefreshToken.decode(token)
+
+    def test_jwt_decode_cached_expired(self):
+        token = AccessToken.encode({'uid': 1})
+        AccessToken.decode(token)
+
+        misses = token_cache.misses
+        expired = time.monotonic() + AccessToken.expire_time.total_seconds() + 1
+        with mock.patch('app.auth.cache.time.monotonic', return_value=expired):
+            AccessToken.decode(token)
+
+        self.assertEqual(token_cache.misses, misses + 1)
+
+    def test_jwt_mint_claims(self):
+        minted = RefreshToken.mint({'uid': 1})
+
+        self.assertEqual(minted.claims, RefreshToken.decode(minted.token))
+        self.assertEqual(minted.claims['iss'], RefreshToken.issuer)
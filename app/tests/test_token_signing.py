@@ -0,0 +1,179 @@
+import datetime
+from unittest import mock
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519
+
+from app.auth import tokens
+from app.auth.jwks import JWKSClient
+from app.auth.tokens import AccessToken, KeyRing, SigningKey, Token, UnknownKeyError
+
+
+def pem(private_key) -> str:
+    return private_key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                     serialization.NoEncryption()).decode()
+
+
+ED25519_KEY = SigningKey('ed-1', 'EdDSA', pem(ed25519.Ed25519PrivateKey.generate()))
+ES256_KEY = SigningKey('es-1', 'ES256', pem(ec.generate_private_key(ec.SECP256R1())))
+
+
+class TestSigningKey:
+    @pytest.mark.parametrize('key', [ED25519_KEY, ES256_KEY])
+    def test_sign_verify(self, key):
+        with mock.patch.object(tokens, 'key_ring', KeyRing(key)):
+            token, claims = Token.mint_token({'uid': 1}, datetime.timedelta(minutes=1), 'test')
+            assert jwt.get_unverified_header(token)['kid'] == key.kid
+            assert jwt.get_unverified_header(token)['alg'] == key.algorithm
+            assert Token.decode_token(token, issuer='test', use_cache=False) == claims
+
+    def test_hs256_token_rejected_by_asymmetric_key(self):
+        token, _ = Token.mint_token({'uid': 1}, datetime.timedelta(minutes=1), 'test')
+
+        with mock.patch.object(tokens, 'key_ring', KeyRing(ED25519_KEY)):
+            with pytest.raises(UnknownKeyError):
+                Token.decode_token(token, issuer='test', use_cache=False)
+
+        with mock.patch.object(tokens, 'key_ring', KeyRing(ED25519_KEY)):
+            with pytest.raises(jwt.exceptions.InvalidAlgorithmError):
+                token = jwt.encode({'uid': 1}, 'secret', algorithm='HS256')
+                Token.decode_token(token, issuer='test', use_cache=False)
+
+    def test_symmetric_key_not_published(self):
+        assert SigningKey('hs', 'HS256', 'secret').jwk is None
+
+    def test_jwk(self):
+        assert ED25519_KEY.jwk['kid'] == 'ed-1'
+        assert ED25519_KEY.jwk['alg'] == 'EdDSA'
+        assert ED25519_KEY.jwk['use'] == 'sig'
+        assert 'd' not in ED25519_KEY.jwk
+
+
+class TestJWKSEndpoint:
+    @pytest.mark.asyncio
+    async def test_jwks_document(self, async_client):
+        with mock.patch.object(tokens, 'key_ring', KeyRing(ED25519_KEY)):
+            response = await async_client.get('/.well-known/jwks.json')
+
+        assert response.status_code == 200
+        assert response.json() == {'keys': [ED25519_KEY.jwk]}
+        assert 'max-age=' in response.headers['cache-control']
+        assert response.headers['etag']
+
+    @pytest.mark.asyncio
+    async def test_jwks_not_modified(self, async_client):
+        with mock.patch.object(tokens, 'key_ring', KeyRing(ED25519_KEY)):
+            response = await async_client.get('/.well-known/jwks.json')
+            etag = response.headers['etag']
+            response = await async_client.get('/.well-known/jwks.json', headers={'If-None-Match': etag})
+
+        assert response.status_code == 304
+        assert response.content == b''
+
+    @pytest.mark.asyncio
+    async def test_jwks_hs256_empty(self, async_client):
+        response = await async_client.get('/.well-known/jwks.json')
+
+        assert response.status_code == 200
+        assert response.json() == {'keys': []}
+
+
+class TestJWKSClient:
+    @pytest.mark.asyncio
+    async def test_client_decode(self, async_client):
+        client = JWKSClient('/.well-known/jwks.json', client=async_client)
+
+        with mock.patch.object(tokens, 'key_ring', KeyRing(ED25519_KEY)):
+            token, claims = AccessToken.mint({'uid': 1})
+            assert await client.decode(token, issuer=AccessToken.issuer) == claims
+
+    @pytest.mark.asyncio
+    async def test_client_caches_keys(self, async_client):
+        client = JWKSClient('/.well-known/jwks.json', client=async_client)
+
+        with mock.patch.object(tokens, 'key_ring', KeyRing(ED25519_KEY)):
+            token, _ = AccessToken.mint({'uid': 1})
+            with mock.patch.object(async_client, 'get', wraps=async_client.get) as get:
+                await client.decode(token, issuer=AccessToken.issuer)
+                await client.decode(token, issuer=AccessToken.issuer)
+
+        assert get.call_count == 1
+
+    @pytest.mark.asyncio
+    async def test_client_unknown_kid(self, async_client):
+        client = JWKSClient('/.well-known/jwks.json', client=async_client, min_refresh_interval=0)
+
+        with mock.patch.object(tokens, 'key_ring', KeyRing(ED25519_KEY)):
+            await client.refresh()
+
+        with mock.patch.object(tokens, 'key_ring', KeyRing(ES256_KEY)):
+            token, claims = AccessToken.mint({'uid': 1})
+            assert await client.decode(token, issuer=AccessToken.issuer) == claims
+
+    @pytest.mark.asyncio
+    async def test_client_rejects_missing_kid(self, async_client):
+        client = JWKSClient('/.well-known/jwks.json', client=async_client)
+
+        with pytest.raises(UnknownKeyError):
+            await client.decode(jwt.encode({'uid': 1}, 'secret', algorithm='HS256'), issuer=AccessToken.issuer)
+
+
+class TestKeyRing:
+    def test_rotation_keeps_old_tokens_valid(self):
+        old = SigningKey('old', 'HS256', 'old-secret')
+        new = SigningKey('new', 'HS256', 'new-secret')
+
+        with mock.patch.object(tokens, 'key_ring', KeyRing(old)):
+            old_token, old_claims = AccessToken.mint({'uid': 1})
+
+        with mock.patch.object(tokens, 'key_ring', KeyRing(new, [old])):
+            new_token, new_claims = AccessToken.mint({'uid': 1})
+            assert jwt.get_unverified_header(new_token)['kid'] == 'new'
+            assert Token.decode_token(old_token, issuer=AccessToken.issuer, use_cache=False) == old_claims
+            assert Token.decode_token(new_token, issuer=AccessToken.issuer, use_cache=False) == new_claims
+
+        with mock.patch.object(tokens, 'key_ring', KeyRing(new)):
+            with pytest.raises(UnknownKeyError):
+                Token.decode_token(old_token, issuer=AccessToken.issuer, use_cache=False)
+
+    def test_duplicate_kid(self):
+        with pytest.raises(ValueError):
+            KeyRing(SigningKey('default', 'HS256', 'new-secret'), [SigningKey('default', 'HS256', 'old-secret')])
+
+        with pytest.raises(ValueError):
+            KeyRing(ED25519_KEY, [ES256_KEY, ES256_KEY])
+
+    def test_kid_does_not_select_other_algorithm(self):
+        ring = KeyRing(SigningKey('hs', 'HS256', 'secret'), [ED25519_KEY])
+        token = jwt.encode({'uid': 1}, 'secret', algorithm='HS256', headers={'kid': 'ed-1'})
+
+        with pytest.raises(jwt.exceptions.InvalidAlgorithmError):
+            ring.verify(token, issuer='test')
+
+    def test_token_without_kid_uses_active_key(self):
+        ring = KeyRing(SigningKey('hs', 'HS256', 'secret'))
+        token, claims = Token.mint_token({'uid': 1}, datetime.timedelta(minutes=1), 'test')
+        token = jwt.encode(claims, 'secret', algorithm='HS256')
+
+        assert ring.verify(token, issuer='test') == claims
+
+    def test_retired_public_key(self):
+        public = ED25519_KEY.public_key.public_bytes(serialization.Encoding.PEM,
+                                                     serialization.PublicFormat.SubjectPublicKeyInfo).decode()
+        retired = SigningKey.from_config('ed-1', 'EdDSA', public)
+        ring = KeyRing(ES256_KEY, [retired])
+
+        assert retired.private_key is None
+        assert [key['kid'] for key in ring.jwks()['keys']] == ['ed-1', 'es-1']
+        token, claims = Token.mint_token({'uid': 1}, datetime.timedelta(minutes=1), 'test')
+        assert ring.verify(ED25519_KEY.sign(claims), issuer='test') == claims
+
+    def test_from_settings(self):
+        with mock.patch.object(tokens.settings, 'JWT_RETIRED_KEYS', [{'kid': 'previous', 'key': 'old-secret'}]):
+            ring = KeyRing.from_settings()
+
+        assert ring.active.kid == tokens.settings.JWT_KEY_ID
+        assert set(ring.keys) == {'previous', tokens.settings.JWT_KEY_ID}
+        assert ring.jwks() == {'keys': []}
@@ -0,0 +1,77 @@
+import asyncio
+import datetime
+import fcntl
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
+
+from app.models import UserRefreshToken
+from app.models.user import User
+from app.tasks import purge_expired_refresh_tokens, RefreshTokenSweeper
+
+
+@pytest.mark.asyncio
+class TestTokenSweeper:
+
+    @pytest.fixture(autouse=True)
+    async def set_up(self, async_session: AsyncSession):
+        user = User(username='testuser', name="test", email='test@test.com')
+        user.set_password('testpassword')
+        async_session.add(user)
+        await async_session.commit()
+
+        now = datetime.datetime.now()
+        for i in range(7):
+            expires_at = now - datetime.timedelta(minutes=1) if i < 5 else now + datetime.timedelta(days=1)
+            async_session.add(UserRefreshToken(user=1, jti=f'jti{i}', created_at=now,
+                                               expires_at=expires_at))
+        await async_session.commit()
+
+    async def test_purge_expired(self, async_session: AsyncSession):
+        assert await purge_expired_refresh_tokens(batch_size=2, batch_pause=0) == 5
+
+        jtis = (await async_session.execute(select(UserRefreshToken.jti))).scalars().all()
+        assert sorted(jtis) == ['jti5', 'jti6']
+
+    async def test_purge_batch(self, async_session: AsyncSession):
+        assert await UserRefreshToken.purge_expired(async_session, batch_size=3) == 3
+        assert await UserRefreshToken.purge_expired(async_session, batch_size=3) == 2
+        assert await UserRefreshToken.purge_expired(async_session, batch_size=3) == 0
+
+    async def test_sweeper_runs(self, async_session: AsyncSession):
+        sweeper = RefreshTokenSweeper(interval=0.05)
+        await sweeper.start()
+        assert sweeper.runs == 0
+
+        for _ in range(100):
+            if sweeper.runs:
+                break
+            await asyncio.sleep(0.01)
+        await sweeper.stop()
+
+        assert sweeper.runs >= 1
+        jtis = (await async_session.execute(select(UserRefreshToken.jti))).scalars().all()
+        assert sorted(jtis) == ['jti5', 'jti6']
+
+    async def test_first_run_delayed(self):
+        sweeper = RefreshTokenSweeper(interval=60)
+        await sweeper.start()
+        await asyncio.sleep(0.05)
+        await sweeper.stop()
+
+        assert sweeper.runs == 0
+
+    async def test_sweep_locked_by_other_worker(self, tmp_path):
+        lock_path = str(tmp_path / 'sweep.lock')
+        sweeper = RefreshTokenSweeper(interval=60, lock_path=lock_path)
+
+        with open(lock_path, 'a') as other_worker:
+            fcntl.flock(other_worker, fcntl.LOCK_EX)
+            assert await sweeper.sweep() is False
+            fcntl.flock(other_worker, fcntl.LOCK_UN)
+
+        assert sweeper.skipped == 1
+        assert await sweeper.sweep() is True
+        assert sweeper.runs == 1
+        assert sweeper.last_purged == 5
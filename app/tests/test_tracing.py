@@ -0,0 +1,87 @@
+import logging
+from unittest import mock
+
+import pytest
+import pytest_asyncio
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette import status
+
+from app.auth.tokens import AccessToken
+from app.config import settings
+from app.models.user import User
+from app.tests.conftest import app
+from app.tracing import NULL_SPAN, TracingMiddleware, current_trace, span, traced
+
+
+def server_timing(response) -> dict:
+    timings = {}
+    for entry in response.headers['server-timing'].split(', '):
+        name, params = entry.split(';dur=')
+        timings.setdefault(name, float(params.split(';')[0]))
+    return timings
+
+
+@pytest.mark.asyncio
+async def test_no_trace():
+    @traced()
+    async def traced_function():
+        return 1
+
+    assert current_trace.get() is None
+    assert span('anything') is NULL_SPAN
+    assert await traced_function() == 1
+
+
+@pytest.mark.asyncio
+class TestTracing:
+
+    @pytest_asyncio.fixture
+    async def client(self):
+        async with AsyncClient(app=TracingMiddleware(app), base_url="http://127.0.0.1:8000") as client:
+            yield client
+
+    @pytest.fixture(autouse=True)
+    async def set_up(self, async_session: AsyncSession):
+        user = User(username='testuser', name="test", email='test@test.com', is_active=True)
+        user.set_password('testpassword')
+        async_session.add(user)
+        await async_session.commit()
+
+    async def test_login_server_timing(self, client: AsyncClient):
+        response = await client.post(app.url_path_for('login_token'),
+                                     json={'login': 'testuser', 'password': 'testpassword'})
+        assert response.status_code == status.HTTP_200_OK
+
+        timings = server_timing(response)
+        assert set(timings) == {'user_lookup', 'password_verify', 'authenticate', 'token_encode', 'refresh_token_commit',
+                                'refresh_token_store', 'auth_generate_tokens', 'db', 'total'}
+        assert timings['authenticate'] >= timings['password_verify']
+        assert timings['total'] >= timings['authenticate'] + timings['auth_generate_tokens']
+
+    async def test_verify_server_timing(self, client: AsyncClient):
+        client.headers.update({'authorization': f'Bearer {AccessToken.encode({"uid": 1})}'})
+        response = await client.get(app.url_path_for('verify'))
+        assert response.status_code == status.HTTP_200_OK
+
+        assert 'auth_verify_token' in server_timing(response)
+
+    async def test_log_line(self, client: AsyncClient, caplog):
+        with caplog.at_level(logging.INFO, logger='app.tracing'):
+            response = await client.post(app.url_path_for('login_token'),
+                                         json={'login': 'testuser', 'password': 'wrong'})
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+        record = caplog.records[-1].msg
+        assert record['method'] == 'POST'
+        assert record['path'] == app.url_path_for('login_token')
+        assert record['status'] == 403
+        assert record['queries'] == 1
+        assert [s['name'] for s in record['spans']] == ['user_lookup', 'password_verify', 'authenticate']
+
+    async def test_server_timing_disabled(self, client: AsyncClient):
+        with mock.patch.object(settings, 'SERVER_TIMING_ENABLED', False):
+            response = await client.get(app.url_path_for('health'))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert 'server-timing' not in response.headers
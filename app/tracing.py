@@ -0,0 +1,128 @@
+import functools
+import logging
+import time
+from contextvars import ContextVar
+from typing import List, Optional
+
+from app.config import settings
+from app.database import QueryCounter, current_queries
+
+logger = logging.getLogger(__name__)
+
+current_trace: ContextVar[Optional['Trace']] = ContextVar('current_trace', default=None)
+
+
+class Trace:
+    __slots__ = ('started', 'spans', 'queries')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans: List[tuple] = []
+        self.queries = QueryCounter()
+
+    def server_timing(self, total: float) -> str:
+        timings = ['%s;dur=%.2f' % (name, duration * 1000) for name, _, duration in self.spans]
+        timings.append('db;dur=%.2f;desc="%d queries"' % (self.queries.duration * 1000, self.queries.count))
+        timings.append('total;dur=%.2f' % (total * 1000))
+        return ', '.join(timings)
+
+
+class Span:
+    __slots__ = ('trace', 'name', 'started')
+
+    def __init__(self, trace: Trace, name: str):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.trace.spans.append((self.name, self.started - self.trace.started, time.perf_counter() - self.started))
+
+
+class NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+
+NULL_SPAN = NullSpan()
+
+
+def span(name: str):
+    # outside a traced request this is a context variable lookup and a shared no-op
+    trace = current_trace.get()
+    return NULL_SPAN if trace is None else Span(trace, name)
+
+
+def traced(name: str = None):
+    def decorator(fn):
+        span_name = name or fn.__name__
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            trace = current_trace.get()
+            if trace is None:
+                return await fn(*args, **kwargs)
+
+            with Span(trace, span_name):
+                return await fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class TracingMiddleware:
+    """
+    Collects the spans and the statement count of one request, adds them as a Server-Timing header
+    when SERVER_TIMING_ENABLED and logs them as a single JSON line once the response is sent.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        trace = Trace()
+        token = current_trace.set(trace)
+        queries_token = current_queries.set(trace.queries)
+        status = None
+        total = None
+
+        async def send_wrapper(message):
+            nonlocal status, total
+            if message['type'] == 'http.response.start':
+                status = message['status']
+                total = time.perf_counter() - trace.started
+                if settings.SERVER_TIMING_ENABLED:
+                    headers = list(message.get('headers', []))
+                    headers.append((b'server-timing', trace.server_timing(total).encode('latin-1')))
+                    message = dict(message, headers=headers)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_trace.reset(token)
+            current_queries.reset(queries_token)
+            if settings.TRACING_LOG_ENABLED:
+                logger.info({
+                    'method': scope['method'],
+                    'path': scope['path'],
+                    'status': status,
+                    'duration_ms': round((time.perf_counter() - trace.started) * 1000, 3),
+                    'response_ms': round(total * 1000, 3) if total is not None else None,
+                    'queries': trace.queries.count,
+                    'query_ms': round(trace.queries.duration * 1000, 3),
+                    'spans': [{'name': name, 'start_ms': round(start * 1000, 3),
+                               'duration_ms': round(duration * 1000, 3)} for name, start, duration in trace.spans],
+                })
@@ -0,0 +1,89 @@
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('APP_CONFIG', 'production')
+os.environ['DATABASE_URL'] = f'sqlite+aiosqlite:///{os.path.join(tempfile.mkdtemp(), "bench.db")}'
+
+from fastapi import Depends, FastAPI
+from sqlmodel import SQLModel
+
+from app.auth.login import auth_access_principal, auth_access_token_required
+from app.auth.middleware import AuthenticationMiddleware
+from app.auth.tokens import AccessToken
+from app.database import async_engine, async_session_maker
+from app.models.user import User
+
+REQUESTS = 5_000
+
+bench = FastAPI()
+
+
+@bench.get('/depends')
+async def verify_depends(user=Depends(auth_access_token_required)):
+    return {'uid': user.id}
+
+
+@bench.get('/middleware')
+async def verify_middleware(user=Depends(auth_access_principal)):
+    return {'uid': user.id}
+
+
+async def request(application, path, headers):
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+        'path': path, 'raw_path': path.encode(), 'root_path': '', 'query_string': b'', 'headers': headers,
+        'client': ('127.0.0.1', 50000), 'server': ('127.0.0.1', 8000),
+    }
+    status = None
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+
+    await application(scope, receive, send)
+    assert status == 200, status
+
+
+async def run(application, path, headers):
+    for _ in range(100):
+        await request(application, path, headers)
+
+    started = time.perf_counter()
+    for _ in range(REQUESTS):
+        await request(application, path, headers)
+    return REQUESTS / (time.perf_counter() - started)
+
+
+async def main():
+    async with async_engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+    async with async_session_maker() as db:
+        user = User(username='bench', name='bench', email='bench@example.com', is_active=True)
+        user.set_password('benchpassword')
+        db.add(user)
+        await db.commit()
+        uid = user.id
+
+    token = AccessToken.encode({'uid': uid})
+    wrapped = AuthenticationMiddleware(bench, router=bench.router)
+
+    for name, headers in [('bearer', [(b'authorization', f'Bearer {token}'.encode())]),
+                          ('cookie', [(b'cookie', f'access_token={token}'.encode())])]:
+        depends = await run(bench, '/depends', headers)
+        middleware = await run(wrapped, '/middleware', headers)
+        print(f'{name} Depends chain: {depends:8.0f} req/s')
+        print(f'{name} middleware:    {middleware:8.0f} req/s ({middleware / depends:.2f}x)')
+
+    await async_engine.dispose()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,94 @@
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import SQLModel, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.auth.login import PRINCIPAL_COLUMNS, auth_verify_token
+from app.auth.principal import principal_cache
+from app.auth.tokens import AccessToken
+from app.models.user import User
+
+ITERATIONS = 2_000
+
+
+async def verify_orm_user(token, db):
+    # previous implementation, full User instance for every request, kept here for comparison
+    payload = AccessToken.decode(token)
+    user = (await db.execute(select(User).where(User.id == payload['uid']))).scalars().first()
+    return user, token, payload
+
+
+async def verify_orm_user_cached(token, db, cache={}):
+    payload = AccessToken.decode(token)
+    snapshot = cache.get(payload['uid'])
+    if snapshot is None:
+        user = (await db.execute(select(User).where(User.id == payload['uid']))).scalars().first()
+        snapshot = cache[payload['uid']] = user.dict(exclude={'password'})
+    user = User(**snapshot)
+    return user, token, payload
+
+
+async def verify_principal(token, db):
+    return await auth_verify_token(token, db)
+
+
+async def measure(verify, token, db):
+    await verify(token, db)
+    db.expunge_all()
+
+    started = time.perf_counter()
+    for _ in range(ITERATIONS):
+        await verify(token, db)
+        db.expunge_all()
+    elapsed = (time.perf_counter() - started) / ITERATIONS
+
+    # peak traced memory of a single call, i.e. how much the request allocates while it runs
+    peaks = []
+    for _ in range(10):
+        tracemalloc.start()
+        await verify(token, db)
+        db.expunge_all()
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    return elapsed, min(peaks)
+
+
+async def main():
+    path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    engine = create_async_engine(f'sqlite+aiosqlite:///{path}')
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+
+    async with AsyncSession(engine, expire_on_commit=False) as db:
+        user = User(username='bench', name='bench', email='bench@example.com', is_active=True)
+        user.set_password('benchpassword')
+        db.add(user)
+        await db.commit()
+
+        token = AccessToken.encode({'uid': user.id})
+        print(f'projected columns: {[column.key for column in PRINCIPAL_COLUMNS]}')
+
+        for name, verify in [('orm user', verify_orm_user), ('principal', verify_principal)]:
+            principal_cache.maxsize = 0
+            elapsed, peak = await measure(verify, token, db)
+            print(f'{name + " uncached:":22} {peak / 1024:6.1f} KiB peak/request {elapsed * 1e6:8.2f} us/request')
+
+        for name, verify in [('orm user', verify_orm_user_cached), ('principal', verify_principal)]:
+            principal_cache.maxsize = 1000
+            elapsed, peak = await measure(verify, token, db)
+            print(f'{name + " cached:":22} {peak / 1024:6.1f} KiB peak/request {elapsed * 1e6:8.2f} us/request')
+
+    await engine.dispose()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
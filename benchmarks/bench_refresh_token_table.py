@@ -0,0 +1,107 @@
+import datetime
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.auth.tokens import RefreshToken, token_digest
+
+BATCH_SIZE = 10_000
+
+COLUMNS = {
+    'token': 'token VARCHAR NOT NULL',
+    'digest': 'token_digest BLOB',
+    'none': None,
+}
+
+
+def create_table(db, column):
+    db.execute(f'''
+        CREATE TABLE userrefreshtoken (
+            id INTEGER NOT NULL PRIMARY KEY,
+            {column + ',' if column else ''}
+            user INTEGER NOT NULL,
+            jti VARCHAR(255) NOT NULL,
+            created_at DATETIME NOT NULL,
+            expires_at DATETIME NOT NULL,
+            blacklisted_at DATETIME,
+            blacklisted BOOLEAN NOT NULL,
+            ip_address VARCHAR(39) NOT NULL,
+            user_agent VARCHAR(255) NOT NULL
+        )''')
+    db.execute('CREATE UNIQUE INDEX ix_userrefreshtoken_jti ON userrefreshtoken (jti)')
+    db.execute('CREATE INDEX ix_userrefreshtoken_expires_at ON userrefreshtoken (expires_at)')
+    db.execute('CREATE INDEX ix_userrefreshtoken_user_blacklisted ON userrefreshtoken (user, blacklisted)')
+
+
+def rows(kind, count, template):
+    now = datetime.datetime.now()
+    expires_at = now + RefreshToken.expire_time
+    for i in range(count):
+        jti = uuid.uuid4().hex
+        # same length as a real token, unique per row
+        token = template[:-32] + jti
+        row = (i % 1000, jti, now, expires_at, False, '127.0.0.1', 'Mozilla/5.0')
+        if kind == 'token':
+            row = (token,) + row
+        elif kind == 'digest':
+            row = (token_digest(token),) + row
+        yield row
+
+
+def bench(kind, count, template):
+    path = os.path.join(tempfile.mkdtemp(), f'{kind}.db')
+    db = sqlite3.connect(path)
+    db.execute('PRAGMA journal_mode=WAL')
+    db.execute('PRAGMA synchronous=NORMAL')
+    create_table(db, COLUMNS[kind])
+
+    columns = ('token, ' if kind == 'token' else 'token_digest, ' if kind == 'digest' else '') + \
+        'user, jti, created_at, expires_at, blacklisted, ip_address, user_agent'
+    placeholders = ', '.join('?' * len(columns.split(',')))
+    query = f'INSERT INTO userrefreshtoken ({columns}) VALUES ({placeholders})'
+
+    batch = []
+    started = time.perf_counter()
+    for row in rows(kind, count, template):
+        batch.append(row)
+        if len(batch) == BATCH_SIZE:
+            db.executemany(query, batch)
+            db.commit()
+            batch.clear()
+    if batch:
+        db.executemany(query, batch)
+        db.commit()
+    elapsed = time.perf_counter() - started
+
+    db.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    table_pages = db.execute("SELECT sum(pgsize) FROM dbstat WHERE name = 'userrefreshtoken'").fetchone()[0] \
+        if has_dbstat(db) else None
+    db.close()
+
+    size = os.path.getsize(path)
+    os.remove(path)
+    return elapsed, size, table_pages
+
+
+def has_dbstat(db):
+    try:
+        db.execute('SELECT 1 FROM dbstat LIMIT 1')
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    template = RefreshToken.encode({'uid': 1})
+
+    print(f'{count} rows, token length {len(template)}')
+    for kind in COLUMNS:
+        elapsed, size, table_size = bench(kind, count, template)
+        table = f', table {table_size / 2 ** 20:.1f} MiB' if table_size else ''
+        print(f'{kind:>6}: {count / elapsed:,.0f} rows/s, file {size / 2 ** 20:.1f} MiB{table}')
@@ -0,0 +1,44 @@
+import asyncio
+import contextlib
+import os
+import sys
+import timeit
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app.config import settings
+from app.database import async_engine, get_async_session
+
+ITERATIONS = 20_000
+
+
+async def get_async_session_per_call() -> AsyncSession:
+    # previous implementation, kept here for comparison
+    print(f'opening database {settings.DATABASE_URL} {os.getcwd()}')
+    async_session = sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False, autocommit=False)
+    async with async_session() as session:
+        yield session
+
+
+async def run(dependency, iterations):
+    for _ in range(iterations):
+        async for _ in dependency():
+            pass
+
+
+def bench(dependency):
+    loop = asyncio.new_event_loop()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        elapsed = timeit.timeit(lambda: loop.run_until_complete(run(dependency, ITERATIONS)), number=1)
+    loop.close()
+    return elapsed / ITERATIONS * 1e6
+
+
+if __name__ == '__main__':
+    before = bench(get_async_session_per_call)
+    after = bench(get_async_session)
+    print(f'sessionmaker per request: {before:.2f} us/request')
+    print(f'shared sessionmaker:      {after:.2f} us/request')
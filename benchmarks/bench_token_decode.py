@@ -0,0 +1,22 @@
+import os
+import sys
+import timeit
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.auth.tokens import AccessToken, Token, token_cache
+
+ITERATIONS = 50_000
+
+
+if __name__ == '__main__':
+    token = AccessToken.encode({'uid': 1})
+
+    uncached = timeit.timeit(lambda: Token.decode_token(token, AccessToken.issuer, use_cache=False), number=ITERATIONS)
+
+    Token.decode_token(token, AccessToken.issuer)
+    cached = timeit.timeit(lambda: Token.decode_token(token, AccessToken.issuer), number=ITERATIONS)
+
+    print(f'decode_token uncached: {uncached / ITERATIONS * 1e6:.2f} us/token')
+    print(f'decode_token cached:   {cached / ITERATIONS * 1e6:.2f} us/token')
+    print(f'cache stats: {token_cache.stats()}')
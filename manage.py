@@ -1,3 +1,4 @@
+import asyncio
 import os
 import sys
 
@@ -10,6 +11,7 @@ from app.config import settings
 from app import get_application
 from app.database import get_local_session
 from app.models.user import User
+from app.tasks import purge_expired_refresh_tokens
 
 
 @click.group()
@@ -61,6 +63,14 @@ def superuser():
     session.commit()
 
 
+@cli.command(short_help="Delete expired refresh tokens")
+@click.option('--batch-size', type=int, default=None, help="Rows deleted per transaction")
+@click.option('--batch-pause', type=float, default=None, help="Seconds to wait between batches")
+def purge_tokens(batch_size, batch_pause):
+    purged = asyncio.run(purge_expired_refresh_tokens(batch_size, batch_pause))
+    click.echo(f"Purged {purged} expired refresh tokens")
+
+
 @cli.command(short_help="Run a shell in the app context.")
 def shell() -> None:
     import code
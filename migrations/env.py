@@ -33,7 +33,7 @@ config.set_main_option("sqlalchemy.url", settings.DATABASE_URL)
 # from myapp import mymodel
 
 # add models
-from app.models.user import User
+from app.models.user import User, UserLoginKey
 from app.models.token import UserRefreshToken
 
 # target_metadata = mymodel.Base.metadata
@@ -0,0 +1,59 @@
+"""refresh token digest
+
+Revision ID: 20c82366a1d0
+Revises: 6a5229869627
+Create Date: 2026-10-18 14:48:53.203617
+
+"""
+import hashlib
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision = '20c82366a1d0'
+down_revision = '6a5229869627'
+branch_labels = None
+depends_on = None
+
+BACKFILL_BATCH_SIZE = 5000
+
+
+def upgrade() -> None:
+    op.add_column('userrefreshtoken', sa.Column('token_digest', sa.LargeBinary(length=32), nullable=True))
+
+    connection = op.get_bind()
+    refresh_token = sa.table('userrefreshtoken', sa.column('id', sa.Integer), sa.column('token'),
+                             sa.column('token_digest', sa.LargeBinary))
+    update = refresh_token.update() \
+        .where(refresh_token.c.id == sa.bindparam('row_id')) \
+        .values(token_digest=sa.bindparam('digest'))
+
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            sa.select(refresh_token.c.id, refresh_token.c.token)
+            .where(refresh_token.c.id > last_id)
+            .order_by(refresh_token.c.id)
+            .limit(BACKFILL_BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+
+        connection.execute(update, [
+            {'row_id': row.id, 'digest': hashlib.sha256(row.token.encode()).digest()} for row in rows
+        ])
+        last_id = rows[-1].id
+
+    with op.batch_alter_table('userrefreshtoken') as batch_op:
+        batch_op.drop_column('token')
+
+
+def downgrade() -> None:
+    # raw tokens cannot be recovered from their digest
+    with op.batch_alter_table('userrefreshtoken') as batch_op:
+        batch_op.add_column(sa.Column('token', sqlmodel.sql.sqltypes.AutoString(), nullable=False, server_default=''))
+
+    op.drop_column('userrefreshtoken', 'token_digest')
@@ -0,0 +1,29 @@
+"""refresh token expiry index
+
+Revision ID: 6a5229869627
+Revises: b388dbad6845
+Create Date: 2026-10-18 13:26:05.771390
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision = '6a5229869627'
+down_revision = 'b388dbad6845'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(op.f('ix_userrefreshtoken_expires_at'), 'userrefreshtoken', ['expires_at'], unique=False,
+                        postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(op.f('ix_userrefreshtoken_expires_at'), table_name='userrefreshtoken',
+                      postgresql_concurrently=True)
@@ -0,0 +1,78 @@
+"""user login keys
+
+Revision ID: b388dbad6845
+Revises: d3e03895cb1b
+Create Date: 2026-10-18 11:02:17.540936
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision = 'b388dbad6845'
+down_revision = 'd3e03895cb1b'
+branch_labels = None
+depends_on = None
+
+BACKFILL_BATCH_SIZE = 1000
+
+
+def normalize_login(login: str) -> str:
+    # frozen copy of app.auth.normalize_login
+    return login.strip().lower()
+
+
+def user_batches(connection, user):
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            sa.select(user.c.id, user.c.username, user.c.email)
+            .where(user.c.id > last_id)
+            .order_by(user.c.id)
+            .limit(BACKFILL_BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        yield rows
+        last_id = rows[-1].id
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    user = sa.table('user', sa.column('id', sa.Integer), sa.column('username'), sa.column('email'))
+
+    # checked before any DDL, sqlite can't roll the table creation back if the backfill fails halfway
+    owners = {}
+    for rows in user_batches(connection, user):
+        for row in rows:
+            for key in {normalize_login(row.username), normalize_login(row.email)}:
+                owners.setdefault(key, set()).add(row.id)
+    conflicts = {key: sorted(ids) for key, ids in owners.items() if len(ids) > 1}
+    if conflicts:
+        raise RuntimeError(
+            'login keys collide after normalization, rename these users before upgrading: ' +
+            ', '.join(f'{key!r} used by users {ids}' for key, ids in sorted(conflicts.items()))
+        )
+
+    login_key = op.create_table('userloginkey',
+    sa.Column('key', sqlmodel.sql.sqltypes.AutoString(length=255), nullable=False),
+    sa.Column('user', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('key')
+    )
+    op.create_index(op.f('ix_userloginkey_user'), 'userloginkey', ['user'], unique=False)
+
+    # backfill in python so keys are normalized exactly like the application does it
+    for rows in user_batches(connection, user):
+        op.bulk_insert(login_key, [
+            {'key': key, 'user': row.id}
+            for row in rows
+            for key in {normalize_login(row.username), normalize_login(row.email)}
+        ])
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_userloginkey_user'), table_name='userloginkey')
+    op.drop_table('userloginkey')
@@ -0,0 +1,38 @@
+"""auth indexes
+
+Revision ID: d3e03895cb1b
+Revises: d56f6a253711
+Create Date: 2026-10-18 10:12:41.118023
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3e03895cb1b'
+down_revision = 'd56f6a253711'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_user_username', 'user', ['username'], True),
+    ('ix_user_email', 'user', ['email'], True),
+    ('ix_userrefreshtoken_jti', 'userrefreshtoken', ['jti'], True),
+    ('ix_userrefreshtoken_user_blacklisted', 'userrefreshtoken', ['user', 'blacklisted'], False),
+]
+
+
+def upgrade() -> None:
+    # postgres builds the indexes with CREATE INDEX CONCURRENTLY, which does not block writes
+    # on large tables but cannot run inside a transaction
+    with op.get_context().autocommit_block():
+        for name, table, columns, unique in INDEXES:
+            op.create_index(name, table, columns, unique=unique, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)